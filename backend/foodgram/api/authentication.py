@@ -0,0 +1,69 @@
+"""
+Аутентификация по токену с кэшированием токенов в памяти процесса.
+"""
+
+import copy
+import hashlib
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from . import versions
+from .cache import LRUCache
+
+tokens = LRUCache(
+    max_size=getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60),
+)
+
+
+def get_version_name(key: str) -> tuple:
+    # В общем кэше хранится не сам токен, а его хэш.
+    return ('token', hashlib.sha256(key.encode()).hexdigest())
+
+
+def evict_token(key: str) -> None:
+    """
+    Удаляет токен из кэша этого процесса и увеличивает его версию, чтобы
+    токен перестал приниматься из кэша и в остальных процессах (при общих
+    для процессов счетчиках версий).
+    """
+
+    tokens.delete(key)
+    versions.bump(get_version_name(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену, которая хранит найденные токены и их
+    пользователей в LRU-кэше процесса (не более AUTH_TOKEN_CACHE_SIZE
+    записей, каждая - не дольше AUTH_TOKEN_CACHE_TTL секунд). Запись
+    принимается, только если не изменились версии токена и пользователя
+    (api.versions): удаление токена и изменение пользователя увеличивают
+    их. В процессе, где токен отозван, он перестает действовать сразу; в
+    остальных процессах - тоже сразу, если счетчики версий общие
+    (api.versions.is_shared), иначе - не позже чем через
+    AUTH_TOKEN_CACHE_TTL секунд. Запрос с кэшированным токеном не
+    обращается к базе данных.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = tokens.get(key)
+        if cached is not None:
+            token_versions, user, token = cached
+            if versions.get_versions(
+                get_version_name(key), ('user', user.pk)
+            ) == token_versions:
+                # Каждый запрос получает свою копию пользователя, чтобы
+                # изменения объекта не попадали в кэш.
+                return copy.copy(user), token
+
+        # Версия токена читается до запроса к базе данных: если токен будет
+        # отозван во время запроса, версия изменится и запись не будет
+        # принята.
+        token_version, = versions.get_versions(get_version_name(key))
+        user, token = super().authenticate_credentials(key)
+        user_version, = versions.get_versions(('user', user.pk))
+        tokens.set(key, ([token_version, user_version], user, token))
+
+        return copy.copy(user), token
@@ -0,0 +1,70 @@
+"""
+Кэши в памяти процесса.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Потокобезопасный кэш с вытеснением давно не использованных записей.
+    Суммарный размер записей не превышает max_size; размер записи
+    вычисляется функцией sizeof (по умолчанию каждая запись имеет размер 1,
+    то есть max_size ограничивает число записей). Если задан ttl, записи
+    устаревают через ttl секунд после сохранения.
+    """
+
+    def __init__(self, max_size: int,
+                 sizeof: Optional[Callable[[Any], int]] = None,
+                 ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.sizeof = sizeof or (lambda value: 1)
+        self.ttl = ttl
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            value, _, expires = self._data[key]
+            if expires is not None and expires < time.monotonic():
+                self._pop(key)
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_size:
+                return
+            expires = None if self.ttl is None else time.monotonic() + self.ttl
+            self._data[key] = (value, size, expires)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.size -= evicted_size
+
+    def delete(self, key: Hashable) -> Any:
+        with self._lock:
+            return self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _pop(self, key: Hashable) -> Any:
+        value, size, _ = self._data.pop(key, (None, 0, None))
+        self.size -= size
+        return value
@@ -3,11 +3,16 @@
 """
 
 import base64
-import imghdr
-import uuid
+import binascii
+from urllib.parse import urlparse
 
-from django.core.files.base import ContentFile
-from rest_framework.serializers import ImageField
+from django.conf import settings
+from PIL import UnidentifiedImageError
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+from rest_framework.fields import SkipField
+from rest_framework.serializers import ImageField, PrimaryKeyRelatedField
+
+from . import services
 
 
 class Base64ImageField(ImageField):
@@ -20,9 +25,34 @@ class Base64ImageField(ImageField):
     https://github.com/tomchristie/django-rest-framework/pull/1268
 
     Updated for Django REST framework 3.
+
+    Before decoding, the payload size and the image dimensions (read from the
+    image header) are checked against IMAGE_MAX_UPLOAD_SIZE and
+    IMAGE_MAX_DIMENSIONS. The image is then re-encoded and its resized
+    variants are attached to the returned file as the ``variants`` attribute.
+
+    When an existing object is updated and the client sends back the URL of
+    the stored image, the field is skipped and the image is left unchanged.
     """
 
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'too_big_dimensions': (
+            'Размеры изображения не должны превышать {max_width}x{max_height}.'
+        ),
+    }
+
+    def is_current_image(self, data):
+        instance = getattr(self.parent, 'instance', None)
+        current = getattr(instance, self.source, None)
+        if not current:
+            return False
+        return urlparse(data).path == urlparse(current.url).path
+
     def to_internal_value(self, data):
+        if isinstance(data, str) and self.is_current_image(data):
+            raise SkipField()
+
         # Check if this is a base64 string
         if isinstance(data, str):
             # Check if the base64 string is in the "data:" format
@@ -30,26 +60,89 @@ class Base64ImageField(ImageField):
                 # Break out the header from the base64 content
                 header, data = data.split(';base64,')
 
+            # Check the decoded size without decoding the payload.
+            max_size = settings.IMAGE_MAX_UPLOAD_SIZE
+            if len(data) * 3 // 4 > max_size:
+                self.fail('too_large', max_size=max_size)
+
             # Try to decode the file. Return validation error if it fails.
             try:
                 decoded_file = base64.b64decode(data)
-            except TypeError:
+            except (TypeError, binascii.Error):
                 self.fail('invalid_image')
 
-            # Generate file name:
-            # 12 characters are more than enough.
-            file_name = str(uuid.uuid4())[:12]
-            # Get the file name extension:
-            file_extension = self.get_file_extension(file_name, decoded_file)
+            # Check the dimensions before decoding the pixel data.
+            try:
+                width, height = services.get_image_size(decoded_file)
+            except (UnidentifiedImageError, OSError):
+                self.fail('invalid_image')
 
-            complete_file_name = "%s.%s" % (file_name, file_extension, )
+            max_width, max_height = settings.IMAGE_MAX_DIMENSIONS
+            if width > max_width or height > max_height:
+                self.fail(
+                    'too_big_dimensions',
+                    max_width=max_width,
+                    max_height=max_height
+                )
 
-            data = ContentFile(decoded_file, name=complete_file_name)
+            variants = services.process_image(decoded_file)
+            data = variants.pop('image')
+            data.variants = variants
 
         return super(Base64ImageField, self).to_internal_value(data)
 
-    def get_file_extension(self, file_name, decoded_file):
 
-        extension = imghdr.what(file_name, decoded_file)
+class ReferenceRelatedField(PrimaryKeyRelatedField):
+    """
+    Поле связи по первичному ключу, которое ищет объекты в справочнике,
+    кэшируемом в памяти процесса (services.reference_data), а не запросом
+    к базе данных. При many=True все объекты ищутся вместе.
+    """
+
+    def __init__(self, reference_data, **kwargs):
+        self.reference_data = reference_data
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return ReferenceManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def to_internal_value(self, data):
+        obj = self.reference_data.get_many([self.to_pk(data)])
+        if not obj:
+            self.fail('does_not_exist', pk_value=data)
+        return obj.popitem()[1]
+
+
+class ReferenceManyRelatedField(ManyRelatedField):
+    """
+    Список связей ReferenceRelatedField: объекты по всем id списка ищутся
+    одним обращением к справочнику.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pks = [child.to_pk(item) for item in data]
+        objects = child.reference_data.get_many(pks)
+        for item, pk in zip(data, pks):
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=item)
 
-        return "jpg" if extension == "jpeg" else extension
+        return [objects[pk] for pk in pks]
@@ -4,26 +4,37 @@
 
 from django_filters import rest_framework as filters
 
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe
+
+from . import services
 
 RECIPE_CHOICES = (
     (0, 'Not_In_List'),
     (1, 'In_List'),
 )
 
+ORDERING_CHOICES = (
+    ('popular', 'Popular'),
+)
+
+
+def get_tag_choices():
+    return [
+        (tag.slug, tag.name) for tag in services.tag_reference.all()
+    ]
+
 
 class RecipeFilter(filters.FilterSet):
     """
     Набор фильтров для получения списка рецептов согласно заданным в
     query_param фильтрам. Доступна фильтрация по избранному, автору, списку
-    покупок и тегам.
+    покупок и тегам, а также сортировка по популярности.
     """
 
     author = filters.NumberFilter(field_name='author__id', lookup_expr='exact')
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags'
     )
     is_in_shopping_cart = filters.ChoiceFilter(
         choices=RECIPE_CHOICES,
@@ -33,6 +44,22 @@ class RecipeFilter(filters.FilterSet):
         choices=RECIPE_CHOICES,
         method='get_is_in'
     )
+    ordering = filters.ChoiceFilter(
+        choices=ORDERING_CHOICES,
+        method='get_ordering'
+    )
+
+    def get_tags(self, queryset, name, value):
+        """
+        Фильтрация рецептов по слагам тегов. Слаги преобразуются в id по
+        справочнику тегов, а рецепты отбираются по пересечению массива
+        tag_ids с ними (индекс GIN), без JOIN с таблицей связей и DISTINCT.
+        """
+
+        tag_ids = [
+            services.tag_reference.get_id('slug', slug) for slug in value
+        ]
+        return queryset.filter(tag_ids__overlap=tag_ids)
 
     def get_is_in(self, queryset, name, value):
         """
@@ -47,6 +74,20 @@ class RecipeFilter(filters.FilterSet):
                     queryset = queryset.filter(shoppings=user)
         return queryset
 
+    def get_ordering(self, queryset, name, value):
+        """
+        Сортировка рецептов: popular - по убыванию числа добавлений в
+        избранное (счетчик favorites_count, индекс
+        recipe_favorites_count_id_idx).
+        """
+
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-id')
+        return queryset
+
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'ordering',
+        )
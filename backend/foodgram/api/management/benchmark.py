@@ -0,0 +1,50 @@
+"""
+Вспомогательные функции для команд измерения производительности.
+"""
+
+import math
+import time
+from typing import Callable, Dict, List
+
+
+def measure(func: Callable, repeat: int, warmup: int = 1) -> List[float]:
+    """
+    Выполняет func warmup раз без замеров, затем repeat раз с замером
+    времени. Возвращает список длительностей выполнения в секундах.
+    """
+
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Вычисляет перцентиль percent (0-100) по методу ближайшего ранга.
+    """
+
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+
+    return ordered[rank - 1]
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    Сводка по замерам в миллисекундах: медиана, p95, p99 и максимум.
+    """
+
+    return {
+        'runs': len(timings),
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'max_ms': round(max(timings) * 1000, 3),
+    }
@@ -0,0 +1,90 @@
+"""
+Команда для измерения стоимости проверки пароля хэшерами из
+PASSWORD_HASHERS и всего запроса на получение токена. По времени проверки
+пароля оценивается число входов в секунду на одно ядро процессора.
+"""
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from api.serializers import GetTokenSerializer
+from users.models import User
+
+from ..benchmark import measure, summarize
+
+PASSWORD = 'bench-Passw0rd!'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+
+    help = 'Измерение стоимости проверки пароля хэшерами PASSWORD_HASHERS'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Число замеров для каждого хэшера',
+        )
+
+    def handle(self, *args, **options):
+
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as error:
+                # Библиотека хэшера (argon2-cffi, bcrypt) не установлена.
+                self.stdout.write(f'{hasher.algorithm:>16}: skipped ({error})')
+                continue
+            result = summarize(measure(
+                lambda: hasher.verify(PASSWORD, encoded), options['repeat']
+            ))
+            self.stdout.write(
+                f'{hasher.algorithm:>16}: p50 {result["p50_ms"]} ms, '
+                f'{1000 / result["p50_ms"]:.1f} logins/s per core'
+            )
+
+        self.stdout.write(
+            'Login request with the default hasher: '
+            + self.bench_login(options['repeat'])
+        )
+
+    def bench_login(self, repeat):
+        """
+        Измеряет проверку данных и выдачу токена так же, как это делает
+        GetTokenView, в транзакции, которая затем откатывается.
+        """
+
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username='bench-login',
+                    email='bench-login@example.com',
+                    password=PASSWORD
+                )
+
+                def login():
+                    serializer = GetTokenSerializer(data={
+                        'email': user.email, 'password': PASSWORD
+                    })
+                    serializer.is_valid(raise_exception=True)
+                    Token.objects.get_or_create(
+                        user=serializer.validated_data['user']
+                    )
+
+                result = summarize(measure(login, repeat))
+                raise Rollback
+        except Rollback:
+            pass
+
+        return (
+            f'p50 {result["p50_ms"]} ms, '
+            f'{1000 / result["p50_ms"]:.1f} requests/s per core'
+        )
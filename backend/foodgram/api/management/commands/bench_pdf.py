@@ -0,0 +1,52 @@
+"""
+Команда для измерения времени формирования списка покупок в формате PDF
+для списков разной длины.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.services import create_pdf
+
+from ..benchmark import measure, summarize
+
+
+class Command(BaseCommand):
+
+    help = 'Измерение времени формирования PDF списка покупок'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--lines',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='Число строк в списке покупок',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Число замеров для каждой длины списка',
+        )
+
+    def handle(self, *args, **options):
+
+        for lines in options['lines']:
+            data = [
+                (f'ингредиент {number}', 'г', number)
+                for number in range(1, lines + 1)
+            ]
+            sizes = []
+
+            def render():
+                file = create_pdf(data, 'Список покупок')
+                sizes.append(file.seek(0, 2))
+                file.close()
+
+            result = summarize(measure(render, options['repeat']))
+            self.stdout.write(
+                f"{lines:>6} lines: p50 {result['p50_ms']} ms, "
+                f"p99 {result['p99_ms']} ms, max {result['max_ms']} ms, "
+                f'{sizes[-1]} bytes'
+            )
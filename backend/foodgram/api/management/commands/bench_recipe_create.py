@@ -0,0 +1,123 @@
+"""
+Команда для измерения времени и числа запросов к базе данных при создании
+рецепта с разным числом ингредиентов. Рецепты создаются через
+RecipeSerializer (валидация и сохранение) в транзакции, которая затем
+откатывается; загруженные изображения удаляются.
+"""
+
+import base64
+import io
+import itertools
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipeSerializer
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+from ..benchmark import measure, summarize
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+
+    help = 'Измерение времени создания рецепта'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            nargs='+',
+            default=[1, 10, 40, 100],
+            help='Число ингредиентов в рецепте',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Число замеров для каждого числа ингредиентов',
+        )
+
+    def handle(self, *args, **options):
+
+        user = User.objects.first()
+        tag_ids = list(Tag.objects.values_list('id', flat=True)[:3])
+        ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)[
+                :max(options['ingredients'])
+            ]
+        )
+        if user is None or not tag_ids:
+            raise CommandError('Нужны хотя бы один пользователь и один тег.')
+        if len(ingredient_ids) < max(options['ingredients']):
+            raise CommandError(
+                f'В базе данных только {len(ingredient_ids)} ингредиентов.'
+            )
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), '#569914').save(buffer, 'PNG')
+        image = (
+            'data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode()
+        )
+        request = Request(APIRequestFactory().post('/api/recipes/'))
+        request.user = user
+        names = itertools.count()
+        files = []
+
+        def create(count):
+            serializer = RecipeSerializer(
+                data={
+                    'name': f'bench recipe {next(names)}',
+                    'text': 'bench',
+                    'cooking_time': 10,
+                    'image': image,
+                    'tags': tag_ids,
+                    'ingredients': [
+                        {'id': ingredient_id, 'amount': 1}
+                        for ingredient_id in ingredient_ids[:count]
+                    ],
+                },
+                context={'request': request}
+            )
+            serializer.is_valid(raise_exception=True)
+            recipe = serializer.save(author=user)
+            files.extend(
+                file.name for file in (
+                    recipe.image, recipe.image_card, recipe.image_thumbnail
+                ) if file
+            )
+
+        try:
+            with transaction.atomic():
+                # Первое создание загружает справочники в память процесса.
+                create(1)
+                for count in options['ingredients']:
+                    with CaptureQueriesContext(connection) as queries:
+                        create(count)
+                    result = summarize(
+                        measure(lambda: create(count), options['repeat'])
+                    )
+                    self.stdout.write(
+                        f"{count:>4} ingredients: "
+                        f"{len(queries.captured_queries)} queries, "
+                        f"p50 {result['p50_ms']} ms, "
+                        f"p99 {result['p99_ms']} ms, "
+                        f"max {result['max_ms']} ms"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            for name in files:
+                default_storage.delete(name)
@@ -0,0 +1,294 @@
+"""
+Команда для измерения стоимости выдачи списков сериализаторами
+RecipeSerializer, IngredientInRecipeSerializer, UserSerializer и
+ListSubscriptionsSerializer при росте размера страницы и числа ингредиентов
+в рецепте.
+
+Для каждого сериализатора и размера страницы измеряются время загрузки
+объектов (запросы с теми же select_related, prefetch_related и
+аннотациями, что и во вьюсетах), время сериализации, число запросов к базе
+данных и пиковый объем памяти, выделенной при загрузке и сериализации
+(tracemalloc). Данные для замеров создаются в транзакции, которая затем
+откатывается. Результаты сохраняются в JSON-файл, чтобы их можно было
+сравнивать между коммитами.
+"""
+
+import json
+import platform
+import time
+import tracemalloc
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import services
+from api.serializers import (IngredientInRecipeSerializer,
+                             ListSubscriptionsSerializer, RecipeSerializer,
+                             UserSerializer)
+from api.views import RecipeViewset, UserViewSet
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import Subscribe, User
+
+from ..benchmark import percentile
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+
+    help = 'Измерение времени и памяти сериализации списков'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            nargs='+',
+            default=[10, 100, 1000],
+            help='Число объектов на странице',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            nargs='+',
+            default=[5, 50],
+            help='Число ингредиентов в рецепте',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Число замеров для каждого случая',
+        )
+        parser.add_argument(
+            '--output',
+            default='bench_serializers.json',
+            help='Файл для сохранения результатов в формате JSON',
+        )
+
+    def handle(self, *args, **options):
+
+        self.repeat = options['repeat']
+        self.results = []
+        max_recipes = max(options['recipes'])
+
+        try:
+            with transaction.atomic():
+                viewer, recipe_ids = self.create_fixture(
+                    max_recipes, options['ingredients']
+                )
+                self.run_cases(viewer, recipe_ids, options['recipes'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(
+                {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'repeat': self.repeat,
+                    'results': self.results,
+                },
+                file,
+                indent=2
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Results saved to {options['output']}")
+        )
+
+    def create_fixture(self, max_recipes, ingredient_counts):
+        """
+        Создает пользователя, от имени которого выполняются запросы,
+        max_recipes авторов, на которых он подписан, и для каждого числа
+        ингредиентов из ingredient_counts - max_recipes рецептов этих
+        авторов. Возвращает пользователя и словарь {число ингредиентов:
+        список id рецептов}.
+        """
+
+        users = User.objects.bulk_create(
+            User(
+                username=f'bench_{number}',
+                email=f'bench_{number}@example.com',
+                first_name='bench',
+                last_name='bench',
+                password='!',
+            )
+            for number in range(max_recipes + 1)
+        )
+        users = list(
+            User.objects.filter(
+                username__in=[user.username for user in users]
+            ).order_by('id')
+        )
+        viewer, authors = users[0], users[1:]
+        Subscribe.objects.bulk_create(
+            Subscribe(user=viewer, user_author=author) for author in authors
+        )
+
+        tags = [
+            Tag.objects.create(
+                name=f'bench {number}', slug=f'bench-{number}'
+            )
+            for number in range(3)
+        ]
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'bench {number}', measurement_unit='г')
+            for number in range(max(ingredient_counts))
+        )
+        ingredient_ids = list(
+            Ingredient.objects.filter(
+                name__in=[ingredient.name for ingredient in ingredients]
+            ).values_list('id', flat=True)
+        )
+
+        recipe_ids = {}
+        for count in ingredient_counts:
+            names = [
+                f'bench {count} {number}' for number in range(max_recipes)
+            ]
+            Recipe.objects.bulk_create(
+                Recipe(
+                    name=name,
+                    text='bench',
+                    cooking_time=10,
+                    author=author,
+                    image='images/bench.png',
+                    tag_ids=[tag.id for tag in tags],
+                )
+                for name, author in zip(names, authors)
+            )
+            ids = list(
+                Recipe.objects.filter(name__in=names).
+                order_by('-pub_date', '-id').values_list('id', flat=True)
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+                for recipe_id in ids
+                for tag in tags
+            )
+            IngredientInRecipe.objects.bulk_create(
+                (
+                    IngredientInRecipe(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        quantity=100
+                    )
+                    for recipe_id in ids
+                    for ingredient_id in ingredient_ids[:count]
+                ),
+                batch_size=5000
+            )
+            viewer.favorite_recipes.add(*ids[::2])
+            viewer.shopping_recipes.add(*ids[::3])
+            services.repair_counters(Recipe, ids)
+            recipe_ids[count] = ids
+
+        services.repair_counters(User, [user.id for user in users])
+        return viewer, recipe_ids
+
+    def get_view(self, viewset, viewer, path, action):
+        request = Request(APIRequestFactory().get(path))
+        request.user = viewer
+        return viewset(
+            request=request, action=action, format_kwarg=None, kwargs={}
+        )
+
+    def run_cases(self, viewer, recipe_ids, page_sizes):
+        recipe_view = self.get_view(
+            RecipeViewset, viewer, '/api/recipes/', 'list'
+        )
+        user_view = self.get_view(UserViewSet, viewer, '/api/users/', 'list')
+        subscriptions_view = self.get_view(
+            UserViewSet, viewer, '/api/users/subscriptions/?recipes_limit=3',
+            'subscriptions'
+        )
+
+        for size in page_sizes:
+            for count, ids in recipe_ids.items():
+                page_ids = ids[:size]
+                self.run_case(
+                    RecipeSerializer, recipe_view, count,
+                    lambda: recipe_view.get_queryset().filter(
+                        id__in=page_ids
+                    ).order_by('-pub_date', '-id')
+                )
+                self.run_case(
+                    IngredientInRecipeSerializer, recipe_view, count,
+                    lambda: IngredientInRecipe.objects.select_related(
+                        'ingredient'
+                    ).filter(recipe_id__in=page_ids).order_by('id')
+                )
+            self.run_case(
+                UserSerializer, user_view, None,
+                lambda: user_view.get_queryset().exclude(
+                    id=viewer.id
+                ).filter(username__startswith='bench_').order_by('id')[:size]
+            )
+            self.run_case(
+                ListSubscriptionsSerializer, subscriptions_view, None,
+                lambda: subscriptions_view.get_subscriptions_queryset()[:size]
+            )
+
+    def run_case(self, serializer_class, view, ingredients, get_queryset):
+        context = {'request': view.request, 'view': view, 'format': None}
+        fetch_timings = []
+        serialize_timings = []
+
+        def run():
+            start = time.perf_counter()
+            objects = list(get_queryset())
+            fetched = time.perf_counter()
+            data = serializer_class(objects, many=True, context=context).data
+            fetch_timings.append(fetched - start)
+            serialize_timings.append(time.perf_counter() - fetched)
+            return objects, data
+
+        # Первый запуск прогревает справочники и кэши процесса.
+        run()
+        fetch_timings.clear()
+        serialize_timings.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            objects, data = run()
+        for _ in range(self.repeat - 1):
+            run()
+
+        # Память измеряется отдельным запуском: tracemalloc замедляет
+        # выполнение, поэтому его время в замеры не входит.
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del fetch_timings[-1], serialize_timings[-1]
+
+        result = {
+            'serializer': serializer_class.__name__,
+            'objects': len(objects),
+            'ingredients': ingredients,
+            'queries': len(queries.captured_queries),
+            'fetch_p50_ms': round(percentile(fetch_timings, 50) * 1000, 3),
+            'serialize_p50_ms': round(
+                percentile(serialize_timings, 50) * 1000, 3
+            ),
+            'serialize_max_ms': round(max(serialize_timings) * 1000, 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'payload_bytes': len(JSONRenderer().render(data)),
+        }
+        self.results.append(result)
+        self.stdout.write(
+            '{serializer:>28} {objects:>5} objects, ingredients '
+            '{ingredients!s:>4}: {queries:>2} queries, fetch '
+            '{fetch_p50_ms} ms, serialize {serialize_p50_ms} ms, peak '
+            '{peak_memory_kb} KB'.format(**result)
+        )
@@ -0,0 +1,141 @@
+"""
+Команда для измерения пропускной способности добавления рецептов в
+избранное и список покупок и удаления из них при одновременных запросах.
+Несколько потоков многократно добавляют и удаляют одни и те же рецепты
+одного пользователя (как при повторных нажатиях кнопки). После замера
+проверяется, что списки пользователя вернулись в исходное состояние и
+сводный список покупок не разошелся с рецептами.
+"""
+
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import services
+from api.services.user_lists import USER_LISTS
+from api.views import FavouriteViewSet, ShoppingListViewSet
+from recipes.models import Recipe
+from users.models import User
+
+from ..benchmark import summarize
+
+VIEWS = {
+    'favorite': FavouriteViewSet,
+    'shopping_cart': ShoppingListViewSet,
+}
+
+
+class Command(BaseCommand):
+
+    help = 'Измерение пропускной способности добавления в списки рецептов'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--threads',
+            type=int,
+            nargs='+',
+            default=[1, 4, 16],
+            help='Число одновременных потоков',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Число запросов в каждом потоке',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=2,
+            help='Число рецептов, которые потоки добавляют и удаляют',
+        )
+
+    def handle(self, *args, **options):
+
+        user = User.objects.first()
+        if user is None:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        recipe_ids = list(
+            Recipe.objects.exclude(favorites=user).exclude(shoppings=user).
+            values_list('id', flat=True)[:options['recipes']]
+        )
+        if len(recipe_ids) < options['recipes']:
+            raise CommandError('Недостаточно рецептов вне списков.')
+
+        for url_path, viewset in VIEWS.items():
+            view = viewset.as_view({'post': 'create'})
+            for threads in options['threads']:
+                result, statuses = self.run(
+                    view, url_path, user, recipe_ids, threads,
+                    options['requests']
+                )
+                self.stdout.write(
+                    f'{url_path:>13}, {threads:>3} threads: '
+                    f"{result['throughput']:.0f} requests/s, "
+                    f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+                    f'statuses {dict(sorted(statuses.items()))}'
+                )
+
+        for list_name in USER_LISTS:
+            services.remove_from_user_list(user, list_name, recipe_ids)
+        drift = services.find_shopping_lists_drift([user.id])
+        if drift:
+            raise CommandError(f'Сводный список покупок разошелся: {drift}')
+        self.stdout.write(
+            self.style.SUCCESS('Shopping list totals are consistent')
+        )
+
+    def run(self, view, url_path, user, recipe_ids, threads, requests):
+        factory = APIRequestFactory()
+        timings = []
+        statuses = {}
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(number):
+            local_timings = []
+            local_statuses = {}
+            barrier.wait()
+            try:
+                for index in range(requests):
+                    recipe_id = recipe_ids[(number + index) % len(recipe_ids)]
+                    # Каждый рецепт поочередно добавляется и удаляется.
+                    if (index // len(recipe_ids)) % 2 == 0:
+                        method = 'post'
+                    else:
+                        method = 'delete'
+                    request = getattr(factory, method)(
+                        f'/api/recipes/{recipe_id}/{url_path}/'
+                    )
+                    force_authenticate(request, user=user)
+                    start = time.perf_counter()
+                    response = view(request, id=str(recipe_id))
+                    local_timings.append(time.perf_counter() - start)
+                    local_statuses[response.status_code] = (
+                        local_statuses.get(response.status_code, 0) + 1
+                    )
+            finally:
+                connection.close()
+            with lock:
+                timings.extend(local_timings)
+                for status, count in local_statuses.items():
+                    statuses[status] = statuses.get(status, 0) + count
+
+        pool = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(threads)
+        ]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        result = summarize(timings)
+        result['throughput'] = len(timings) / elapsed
+        return result, statuses
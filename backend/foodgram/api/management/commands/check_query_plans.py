@@ -0,0 +1,204 @@
+"""
+Команда для проверки планов выполнения основных запросов API (EXPLAIN):
+ленты рецептов с фильтрами, загрузки ингредиентов и тегов страницы,
+списка подписок, избранного и списка покупок. Команда завершается с
+ошибкой, если какой-либо запрос читает последовательным сканированием
+(Seq Scan) таблицу, в которой не меньше --min-rows строк.
+
+Планы зависят от объема данных и статистики, поэтому команду следует
+запускать на базе данных реалистичного размера (например, заполненной
+командой generate_dataset). Поддерживается только PostgreSQL: схема
+базы данных использует ArrayField и GIN-индексы. Команда запускается
+тестом api.tests.QueryPlansTest.
+"""
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import (CustomCursorPagination,
+                            PopularRecipesCursorPagination)
+from api.views import RecipeViewset, UserViewSet
+from recipes.models import IngredientInRecipe, Recipe, Tag
+from users.models import ShoppingListIngredient, Subscribe, User
+
+PAGE_SIZE = 6
+
+# Узел плана, читающий таблицу полностью.
+SEQ_SCAN = re.compile(r'\bSeq Scan on (\w+)')
+
+
+class Command(BaseCommand):
+
+    help = 'Проверка планов выполнения основных запросов'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=10000,
+            help='Минимальное число строк таблицы, при котором '
+                 'последовательное сканирование считается ошибкой',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Обновить статистику таблиц (ANALYZE) перед проверкой',
+        )
+
+    def handle(self, *args, **options):
+
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                f'База данных {connection.vendor} не поддерживается.'
+            )
+        user = (
+            User.objects.filter(subscriber__isnull=False).first()
+            or User.objects.first()
+        )
+        if user is None or not Recipe.objects.exists():
+            raise CommandError('Нужны хотя бы один пользователь и рецепт.')
+
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self.row_counts = {}
+        failures = []
+        for name, queryset in self.get_querysets(user):
+            plan = queryset.explain()
+            scans = [
+                table for table in
+                sorted(set(SEQ_SCAN.findall(plan)))
+                if self.count_rows(table) >= options['min_rows']
+            ]
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f"{name}: sequential scan of {', '.join(scans)}"
+                ))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(
+                f"Последовательное сканирование: {', '.join(failures)}"
+            )
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes'))
+
+    def get_view(self, viewset, user, path, action):
+        request = Request(APIRequestFactory().get(path))
+        request.user = user
+        return viewset(
+            request=request, action=action, format_kwarg=None, kwargs={}
+        )
+
+    def get_querysets(self, user):
+        """
+        Возвращает пары (название, queryset) проверяемых запросов. Запросы
+        строятся так же, как во вьюсетах.
+        """
+
+        recipes = self.get_view(
+            RecipeViewset, user, '/api/recipes/', 'list'
+        ).get_queryset().order_by('-pub_date', '-id')
+        page = list(recipes[:PAGE_SIZE])
+        page_ids = [recipe.id for recipe in page]
+        popular = recipes.order_by(*PopularRecipesCursorPagination.ordering)
+        author_id = (
+            Recipe.objects.values_list('author_id', flat=True).first()
+        )
+        tag_id = Tag.objects.values_list('id', flat=True).first()
+        subscriptions = self.get_view(
+            UserViewSet, user,
+            '/api/users/subscriptions/?recipes_limit=3', 'subscriptions'
+        ).get_subscriptions_queryset()
+
+        return (
+            ('recipes_list', recipes[:PAGE_SIZE]),
+            (
+                'recipes_list_next_page',
+                self.get_next_page(CustomCursorPagination, recipes)
+            ),
+            (
+                'recipes_by_author',
+                recipes.filter(author_id=author_id)[:PAGE_SIZE]
+            ),
+            (
+                'recipes_by_tag',
+                recipes.filter(tag_ids__overlap=[tag_id])[:PAGE_SIZE]
+            ),
+            ('recipes_popular', popular[:PAGE_SIZE]),
+            (
+                'recipes_popular_next_page',
+                self.get_next_page(PopularRecipesCursorPagination, popular)
+            ),
+            ('recipes_favorited', recipes.filter(favorites=user)[:PAGE_SIZE]),
+            ('recipes_in_cart', recipes.filter(shoppings=user)[:PAGE_SIZE]),
+            (
+                'page_ingredients',
+                IngredientInRecipe.objects.select_related('ingredient').
+                filter(recipe_id__in=page_ids).order_by('id')
+            ),
+            ('page_tags', Tag.objects.filter(recipes__in=page_ids)),
+            ('subscriptions', subscriptions[:PAGE_SIZE]),
+            (
+                'author_subscribers',
+                Subscribe.objects.filter(user_author_id=author_id)
+            ),
+            (
+                'recipe_favorited_by',
+                User.favorite_recipes.through.objects.filter(
+                    recipe_id=page_ids[0]
+                )
+            ),
+            (
+                'recipe_in_carts_of',
+                User.shopping_recipes.through.objects.filter(
+                    recipe_id=page_ids[0]
+                )
+            ),
+            (
+                'shopping_list',
+                ShoppingListIngredient.objects.filter(user=user).
+                select_related('ingredient')
+            ),
+        )
+
+    def get_next_page(self, pagination_class, queryset):
+        """
+        Запрос второй страницы пагинации по ключу pagination_class.
+        """
+
+        paginator = pagination_class()
+        last = list(queryset[:PAGE_SIZE])[-1]
+        return paginator.filter_by_position(
+            queryset, paginator.ordering,
+            paginator._get_position_from_instance(last, paginator.ordering)
+        )[:PAGE_SIZE]
+
+    def count_rows(self, table):
+        if table not in self.row_counts:
+            with connection.cursor() as cursor:
+                # Оценка по статистике, без полного подсчета строк; для
+                # таблицы без статистики reltuples равно -1.
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE relname = %s',
+                    [table]
+                )
+                count, = cursor.fetchone() or (-1,)
+                if count < 0:
+                    cursor.execute(
+                        'SELECT COUNT(*) FROM '
+                        f'{connection.ops.quote_name(table)}'
+                    )
+                    count, = cursor.fetchone()
+            self.row_counts[table] = count
+        return self.row_counts[table]
@@ -0,0 +1,252 @@
+"""
+Команда для нагрузочного тестирования запущенного сервера (runserver или
+gunicorn) сценариями работы пользователей фронтенда.
+
+Каждый виртуальный пользователь входит по адресу e-mail и паролю
+(по умолчанию - пользователи команды generate_dataset) и до окончания
+теста повторяет сценарий: просмотр списка рецептов с фильтром по тегу,
+открытие рецептов, добавление в избранное и список покупок или удаление
+из них, загрузка списка покупок и просмотр подписок. Для каждого шага
+выводятся число запросов, ошибок, пропускная способность и перцентили
+времени ответа.
+"""
+
+import asyncio
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ..benchmark import summarize
+from ..http_client import HttpClient, HttpError
+
+STEPS = (
+    'login',
+    'recipes_list',
+    'recipe_detail',
+    'favorite_toggle',
+    'cart_toggle',
+    'cart_download',
+    'subscriptions',
+)
+
+
+class Command(BaseCommand):
+
+    help = 'Нагрузочное тестирование сценариями пользователей'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--base-url',
+            default='http://127.0.0.1:8000/api',
+            help='Адрес API тестируемого сервера',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help='Число одновременно работающих пользователей',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=60,
+            help='Длительность теста в секундах',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='gen',
+            help='Префикс имен пользователей generate_dataset',
+        )
+        parser.add_argument(
+            '--password',
+            default='generated-password',
+            help='Пароль пользователей',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=6,
+            help='Число объектов на странице',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help='Максимальное время ответа в секундах',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для сохранения результатов в формате JSON',
+        )
+
+    def handle(self, *args, **options):
+
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.timings = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+
+        elapsed = asyncio.run(self.run())
+
+        results = {}
+        for step in STEPS:
+            if not self.timings[step]:
+                continue
+            result = summarize(self.timings[step])
+            result['errors'] = self.errors[step]
+            result['throughput'] = round(len(self.timings[step]) / elapsed, 1)
+            results[step] = result
+            self.stdout.write(
+                f"{step:>15}: {result['runs']:>6} requests, "
+                f"{result['errors']:>4} errors, "
+                f"{result['throughput']:>7} requests/s, "
+                f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                f"p99 {result['p99_ms']} ms"
+            )
+        total = sum(len(timings) for timings in self.timings.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} requests in {elapsed:.1f} s, '
+            f'{total / elapsed:.1f} requests/s'
+        ))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(
+                    {
+                        'users': options['users'],
+                        'duration': round(elapsed, 3),
+                        'requests': total,
+                        'steps': results,
+                    },
+                    file,
+                    indent=2
+                )
+
+    async def run(self):
+        client = HttpClient(self.options['base_url'], self.options['timeout'])
+        try:
+            response = await client.request('GET', '/tags/')
+        except (OSError, HttpError, asyncio.TimeoutError) as error:
+            raise CommandError(f'Сервер недоступен: {error}')
+        finally:
+            await client.close()
+        if response.status != 200:
+            raise CommandError(f'GET /tags/ вернул {response.status}')
+        self.tags = [tag['slug'] for tag in response.json()]
+
+        start = time.perf_counter()
+        self.deadline = start + self.options['duration']
+        await asyncio.gather(*(
+            self.user_journey(number)
+            for number in range(self.options['users'])
+        ))
+        return time.perf_counter() - start
+
+    async def step(self, client, name, method, path, data=None,
+                   expected=(200,)):
+        """
+        Выполняет запрос шага name и записывает время ответа. Возвращает
+        ответ или None, если запрос завершился ошибкой.
+        """
+
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, data)
+        except (OSError, HttpError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError):
+            response = None
+        self.timings[name].append(time.perf_counter() - start)
+        if response is None or response.status not in expected:
+            self.errors[name] += 1
+            return None
+        return response
+
+    async def user_journey(self, number):
+        client = HttpClient(self.options['base_url'], self.options['timeout'])
+        rng = random.Random(self.rng.random())
+        try:
+            response = await self.step(
+                client, 'login', 'POST', '/auth/token/login/',
+                {
+                    'email': f"{self.options['prefix']}_{number}@example.com",
+                    'password': self.options['password'],
+                },
+                expected=(200, 201)
+            )
+            if response is None:
+                return
+            client.headers['Authorization'] = (
+                f"Token {response.json()['auth_token']}"
+            )
+
+            while time.perf_counter() < self.deadline:
+                tag = rng.choice(self.tags) if self.tags else ''
+                recipes = await self.browse(
+                    client, 'recipes_list', f'/recipes/?tags={tag}',
+                    rng.randint(1, 3)
+                )
+
+                for recipe in rng.sample(recipes, min(len(recipes), 3)):
+                    response = await self.step(
+                        client, 'recipe_detail', 'GET',
+                        f"/recipes/{recipe['id']}/"
+                    )
+                    if response is None:
+                        continue
+                    recipe = response.json()
+                    await self.toggle(
+                        client, 'favorite_toggle',
+                        f"/recipes/{recipe['id']}/favorite/",
+                        recipe['is_favorited']
+                    )
+                    await self.toggle(
+                        client, 'cart_toggle',
+                        f"/recipes/{recipe['id']}/shopping_cart/",
+                        recipe['is_in_shopping_cart']
+                    )
+
+                await self.step(
+                    client, 'cart_download', 'GET',
+                    '/recipes/download_shopping_cart/'
+                )
+                await self.browse(
+                    client, 'subscriptions',
+                    '/users/subscriptions/?recipes_limit=3', 2
+                )
+        finally:
+            await client.close()
+
+    async def browse(self, client, name, path, pages):
+        """
+        Просматривает до pages страниц списка path, пока есть следующая
+        страница. Возвращает объекты последней полученной страницы.
+        """
+
+        results = []
+        for page in range(1, pages + 1):
+            response = await self.step(
+                client, name, 'GET',
+                f"{path}&page={page}&limit={self.options['page_size']}"
+            )
+            if response is None:
+                break
+            data = response.json()
+            results = data['results']
+            if not data['next']:
+                break
+        return results
+
+    async def toggle(self, client, name, path, added):
+        if added:
+            await self.step(client, name, 'DELETE', path, expected=(204,))
+        else:
+            await self.step(client, name, 'POST', path, expected=(201,))
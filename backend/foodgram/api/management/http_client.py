@@ -0,0 +1,147 @@
+"""
+Минимальный асинхронный HTTP/1.1 клиент для нагрузочного тестирования:
+одно постоянное (keep-alive) соединение на клиента, без сторонних
+зависимостей.
+"""
+
+import asyncio
+import json
+import ssl
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+
+class HttpError(Exception):
+    pass
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpClient:
+    """
+    Клиент, отправляющий запросы к серверу base_url по одному соединению.
+    Если сервер закрыл соединение, при следующем запросе оно открывается
+    заново.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if (
+            url.scheme == 'https'
+        ) else None
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self.headers = {}
+        self.reader = self.writer = None
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, data=None,
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Отправляет запрос; data передается в теле запроса в формате JSON.
+        """
+
+        body = b'' if data is None else json.dumps(data).encode()
+        lines = [
+            f'{method} {self.prefix}{path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+            f'Content-Length: {len(body)}',
+        ]
+        if data is not None:
+            lines.append('Content-Type: application/json')
+        for name, value in {**self.headers, **(headers or {})}.items():
+            lines.append(f'{name}: {value}')
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+        # Соединение, закрытое сервером между запросами, обнаруживается
+        # только при чтении ответа, поэтому запрос по переиспользуемому
+        # соединению повторяется один раз по новому соединению.
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(
+                self._send(method, message), self.timeout
+            )
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+        return await asyncio.wait_for(
+            self._send(method, message), self.timeout
+        )
+
+    async def _send(self, method: str, message: bytes) -> Response:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl
+            )
+        self.writer.write(message)
+        await self.writer.drain()
+        try:
+            return await self._read_response(method)
+        except BaseException:
+            # После ошибки чтения состояние соединения неизвестно.
+            await self.close()
+            raise
+
+    async def _read_response(self, method: str) -> Response:
+        status_line = await self.reader.readuntil(b'\r\n')
+        try:
+            version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+            status = int(status)
+        except ValueError:
+            raise HttpError(f'Invalid status line {status_line!r}')
+
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(
+                int(headers['content-length'])
+            )
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+
+        connection = headers.get('connection', '').lower()
+        if connection == 'close' or (
+            version == 'HTTP/1.0' and connection != 'keep-alive'
+        ):
+            await self.close()
+
+        return Response(status, headers, body)
+
+    async def _read_chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size_line = await self.reader.readuntil(b'\r\n')
+            size = int(size_line.split(b';', 1)[0], 16)
+            if size == 0:
+                # Заголовки после последнего блока (trailer) пропускаются.
+                while await self.reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
@@ -0,0 +1,192 @@
+"""
+Метрики обработки запросов: число запросов, гистограммы длительности и
+числа SQL-запросов, суммарное время SQL-запросов и число превышений
+бюджетов - для каждой пары (представление, действие). Метрики хранятся в
+памяти процесса и выдаются в текстовом формате Prometheus.
+"""
+
+import bisect
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+
+PREFIX = 'foodgram'
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными верхними границами корзин buckets.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((format(bound, 'g'), total))
+        result.append(('+Inf', self.count))
+        return result
+
+
+class ViewMetrics:
+
+    def __init__(self, latency_buckets: Sequence[float],
+                 query_buckets: Sequence[float]):
+        self.requests = 0
+        self.errors = 0
+        self.duration = Histogram(latency_buckets)
+        self.queries = Histogram(query_buckets)
+        self.query_seconds = 0.0
+        self.budget_exceeded = {'queries': 0, 'latency': 0}
+
+
+class MetricsRegistry:
+    """
+    Потокобезопасный реестр метрик запросов.
+    """
+
+    def __init__(self, latency_buckets: Sequence[float],
+                 query_buckets: Sequence[float]):
+        self.latency_buckets = latency_buckets
+        self.query_buckets = query_buckets
+        self._lock = threading.Lock()
+        self._views: Dict[Tuple[str, str], ViewMetrics] = {}
+
+    def observe(self, view: str, action: str, status_code: int,
+                duration: float, queries: int, query_seconds: float,
+                exceeded: Iterable[str] = ()) -> None:
+        with self._lock:
+            metrics = self._views.get((view, action))
+            if metrics is None:
+                metrics = self._views[(view, action)] = ViewMetrics(
+                    self.latency_buckets, self.query_buckets
+                )
+            metrics.requests += 1
+            if status_code >= 500:
+                metrics.errors += 1
+            metrics.duration.observe(duration)
+            metrics.queries.observe(queries)
+            metrics.query_seconds += query_seconds
+            for budget in exceeded:
+                metrics.budget_exceeded[budget] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._views.clear()
+
+    def render(self) -> str:
+        """
+        Возвращает метрики в текстовом формате Prometheus.
+        """
+
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}_{name} {kind}')
+
+        def sample(name, labels, value):
+            label_text = ','.join(
+                f'{key}="{escape(str(label))}"' for key, label in labels
+            )
+            lines.append(f'{PREFIX}_{name}{{{label_text}}} {value}')
+
+        def histogram(name, labels, histogram):
+            for bound, count in histogram.cumulative():
+                sample(f'{name}_bucket', labels + [('le', bound)], count)
+            sample(f'{name}_sum', labels, format(histogram.sum, 'g'))
+            sample(f'{name}_count', labels, histogram.count)
+
+        with self._lock:
+            views = sorted(self._views.items())
+
+            family('http_requests_total', 'counter', 'Processed requests.')
+            for (view, action), metrics in views:
+                sample(
+                    'http_requests_total',
+                    [('view', view), ('action', action)],
+                    metrics.requests
+                )
+            family(
+                'http_server_errors_total', 'counter',
+                'Requests answered with a 5xx status.'
+            )
+            for (view, action), metrics in views:
+                sample(
+                    'http_server_errors_total',
+                    [('view', view), ('action', action)],
+                    metrics.errors
+                )
+            family(
+                'http_request_duration_seconds', 'histogram',
+                'Request processing time.'
+            )
+            for (view, action), metrics in views:
+                histogram(
+                    'http_request_duration_seconds',
+                    [('view', view), ('action', action)],
+                    metrics.duration
+                )
+            family(
+                'db_queries_per_request', 'histogram',
+                'SQL queries executed per request.'
+            )
+            for (view, action), metrics in views:
+                histogram(
+                    'db_queries_per_request',
+                    [('view', view), ('action', action)],
+                    metrics.queries
+                )
+            family(
+                'db_query_duration_seconds_total', 'counter',
+                'Time spent executing SQL queries.'
+            )
+            for (view, action), metrics in views:
+                sample(
+                    'db_query_duration_seconds_total',
+                    [('view', view), ('action', action)],
+                    format(metrics.query_seconds, 'g')
+                )
+            family(
+                'budget_exceeded_total', 'counter',
+                'Requests that exceeded the query or latency budget.'
+            )
+            for (view, action), metrics in views:
+                for budget, count in sorted(metrics.budget_exceeded.items()):
+                    sample(
+                        'budget_exceeded_total',
+                        [('view', view), ('action', action),
+                         ('budget', budget)],
+                        count
+                    )
+
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value: str) -> str:
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+registry = MetricsRegistry(
+    latency_buckets=getattr(
+        settings, 'METRICS_LATENCY_BUCKETS',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    ),
+    query_buckets=getattr(
+        settings, 'METRICS_QUERY_BUCKETS', (0, 1, 2, 5, 10, 20, 50, 100)
+    ),
+)
@@ -0,0 +1,110 @@
+"""
+Middleware для сбора метрик обработки запросов.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Обертка выполнения SQL-запросов (connection.execute_wrapper), которая
+    считает число запросов и их суммарное время.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+def get_view_labels(view_func, method):
+    """
+    Возвращает имя представления и действие: для вьюсетов DRF - имя класса
+    и действие, соответствующее HTTP-методу, для остальных представлений -
+    имя класса или функции и HTTP-метод.
+    """
+
+    view_class = getattr(view_func, 'cls', None) or getattr(
+        view_func, 'view_class', None
+    )
+    name = view_class.__name__ if view_class else view_func.__name__
+    actions = getattr(view_func, 'actions', None) or {}
+
+    return name, actions.get(method.lower(), method.lower())
+
+
+class MetricsMiddleware:
+    """
+    Записывает для каждого запроса длительность, число и время SQL-запросов
+    в реестр метрик api.metrics по паре (представление, действие). Запросы,
+    превысившие METRICS_QUERY_BUDGET SQL-запросов или
+    METRICS_LATENCY_BUDGET секунд, записываются в журнал и учитываются в
+    метрике budget_exceeded_total.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.query_budget = getattr(settings, 'METRICS_QUERY_BUDGET', None)
+        self.latency_budget = getattr(
+            settings, 'METRICS_LATENCY_BUDGET', None
+        )
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view, action = getattr(
+            request, 'metrics_view_labels',
+            ('unresolved', request.method.lower())
+        )
+        exceeded = []
+        if self.query_budget is not None and (
+            counter.count > self.query_budget
+        ):
+            exceeded.append('queries')
+        if self.latency_budget is not None and (
+            duration > self.latency_budget
+        ):
+            exceeded.append('latency')
+        if exceeded:
+            logger.warning(
+                '%s %s (%s.%s) exceeded budget: %d queries, %.3f s',
+                request.method, request.path, view, action,
+                counter.count, duration
+            )
+
+        registry.observe(
+            view, action, response.status_code, duration,
+            counter.count, counter.seconds, exceeded
+        )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view_labels = get_view_labels(
+            view_func, request.method
+        )
@@ -2,12 +2,23 @@
 Описание кастомных mixins.
 """
 
+import hashlib
+
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import status
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin
+from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from recipes.models import Recipe
+
+from . import services, versions
+from .pagination import CustomCursorPagination
+from .serializers import RecipesMiniSerializers
+
 
 class CustomCreateDeleteMixin(DestroyModelMixin, CreateModelMixin,
                               GenericViewSet):
@@ -35,10 +46,175 @@ class CustomCreateDeleteMixin(DestroyModelMixin, CreateModelMixin,
         queryset = self.get_queryset()
 
         if queryset.filter(id=id).exists():
-            queryset.remove(obj)
+            self.perform_remove(obj)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        return Response(
+            {'errors': f'{self.error}', },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def perform_remove(self, obj):
+        self.get_queryset().remove(obj)
+
+
+class UserRecipeListMixin(GenericViewSet):
+    """
+    Добавление рецепта в список пользователя list_name (избранное или список
+    покупок) и удаление из него. Каждая операция выполняется одним запросом
+    INSERT ... ON CONFLICT DO NOTHING или DELETE ... RETURNING к
+    промежуточной таблице, поэтому повторные и одновременные запросы не
+    приводят к ошибкам и двойному учету рецепта.
+    """
+
+    list_name = None
+    list_title = None
+    error = 'Указанный рецепт не был добавлен в список'
+
+    def get_recipe_id(self, id):
+        return int(id) if str(id).isdigit() else None
+
+    def create(self, request, id):
+
+        recipe_id = self.get_recipe_id(id)
+        if recipe_id is not None and services.add_to_user_list(
+            request.user, self.list_name, [recipe_id]
+        ):
+            recipe = Recipe.objects.get(id=recipe_id)
+            return Response(
+                RecipesMiniSerializers(recipe).data,
+                status=status.HTTP_201_CREATED
+            )
+
+        # Рецепт не добавлен: он не существует или уже есть в списке.
+        recipe = Recipe.objects.filter(id=recipe_id).first()
+        if recipe is None:
+            errors = {'recipe': [
+                str(PrimaryKeyRelatedField.default_error_messages[
+                    'does_not_exist'
+                ]).format(pk_value=id)
+            ]}
+        else:
+            errors = {'non_field_errors': [
+                f'Рецепт {recipe} уже добавлен в {self.list_title}.'
+            ]}
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def delete(self, request, id):
+
+        recipe_id = self.get_recipe_id(id)
+        if recipe_id is not None and services.remove_from_user_list(
+            request.user, self.list_name, [recipe_id]
+        ):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+        get_object_or_404(Recipe, id=recipe_id)
         return Response(
             {'errors': f'{self.error}', },
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class CursorPaginationMixin:
+    """
+    Включает пагинацию по ключу вместо постраничной, если клиент передал
+    параметр pagination=cursor (для первой страницы) или курсор (для
+    последующих страниц, ссылки на которые возвращаются в next/previous).
+    """
+
+    cursor_pagination_class = CustomCursorPagination
+    pagination_mode_query_param = 'pagination'
+
+    def get_cursor_pagination_class(self):
+        return self.cursor_pagination_class
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.get_cursor_pagination_class()
+            params = self.request.query_params
+            if pagination_class is not None and (
+                params.get(self.pagination_mode_query_param) == 'cursor'
+                or pagination_class.cursor_query_param in params
+            ):
+                self._paginator = pagination_class()
+        return super().paginator
+
+
+class ConditionalGetMixin:
+    """
+    Отвечает на GET запросы с заголовком If-None-Match кодом 304, если ETag
+    ресурса не изменился, не выполняя запросов к базе данных и сериализации.
+    ETag вычисляется методом get_etag_parts по счетчикам версий данных
+    (api.versions) для действий из conditional_actions. Условные запросы
+    обрабатываются, только если счетчики общие для всех процессов
+    (api.versions.is_shared).
+    """
+
+    conditional_actions = ('list', 'retrieve')
+    etag_vary_headers = ()
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        """
+        Возвращает данные, от которых зависит ответ (версии данных,
+        параметры запроса), или None, если ETag для запроса не вычисляется
+        (например, объект не существует). Метод должен быть определен в
+        каждом вьюсете с этим mixin.
+        """
+
+        raise NotImplementedError(
+            f'{type(self).__name__} должен определять get_etag_parts().'
+        )
+
+    def get_etag(self, parts):
+        return quote_etag(
+            hashlib.md5(repr(parts).encode()).hexdigest()
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        etag = getattr(self, '_etag', None)
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_vary_headers(response, self.etag_vary_headers)
+        return response
+
+    def handle_conditional_get(self, request, *args, **kwargs):
+        """
+        Вычисляет ETag ресурса и возвращает ответ 304, если клиент передал
+        совпадающий ETag в If-None-Match, иначе None.
+        """
+
+        if (request.method not in ('GET', 'HEAD')
+                or self.action not in self.conditional_actions
+                or not versions.is_shared()):
+            return None
+
+        parts = self.get_etag_parts(request, *args, **kwargs)
+        if parts is None:
+            return None
+        self._etag = self.get_etag(parts)
+        client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+        # Слабое сравнение: ETag с префиксом W/ (например, после сжатия
+        # ответа прокси-сервером) считается совпадающим.
+        client_etags = {
+            etag[2:] if etag.startswith('W/') else etag
+            for etag in client_etags
+        }
+        if '*' in client_etags or self._etag in client_etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return None
+
+    def list(self, request, *args, **kwargs):
+        response = self.handle_conditional_get(request, *args, **kwargs)
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.handle_conditional_get(request, *args, **kwargs)
+        if response is not None:
+            return response
+        return super().retrieve(request, *args, **kwargs)
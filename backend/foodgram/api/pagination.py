@@ -1,10 +1,155 @@
 """
-Описание кастомного класса пагинации.
+Описание кастомных классов пагинации.
 """
 
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_query_param = 'page'
     page_size_query_param = 'limit'
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Пагинация по ключу (keyset): следующая страница выбирается условием по
+    ключу сортировки последнего элемента предыдущей страницы, без COUNT(*) и
+    OFFSET. Стоимость любой страницы одинакова, а выдача не сдвигается при
+    добавлении новых записей.
+
+    В отличие от CursorPagination из DRF, курсор хранит значения всех полей
+    сортировки, а не только первого, и страница выбирается сравнением
+    строк ROW(f1, f2) < ROW(v1, v2), которое используется как условие
+    индекса (f1, f2). Последнее поле сортировки должно быть уникальным,
+    поэтому совпадающие значения первых полей не требуют смещения (OFFSET).
+    """
+
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+
+        # Для предыдущей страницы выборка идет в обратном порядке от
+        # первого элемента текущей страницы.
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = self.filter_by_position(queryset, ordering, position)
+
+        # Дополнительный элемент показывает, есть ли следующая страница.
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering)
+            if len(results) > len(self.page) else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = following_position is not None
+            self.next_position = position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = position is not None
+            self.next_position = following_position
+            self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def filter_by_position(self, queryset, ordering, position):
+        """
+        Оставляет в queryset объекты, следующие за позицией position при
+        сортировке ordering: ROW(f1, f2) > ROW(v1, v2) (для сортировки по
+        убыванию - меньше). Если поля сортируются в разных направлениях,
+        условие записывается как f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...
+        """
+
+        names = [field.lstrip('-') for field in ordering]
+        descending = [field.startswith('-') for field in ordering]
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(names):
+                raise ValueError
+            values = [
+                queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(set(descending)) == 1:
+            lookup = 'lt' if descending[0] else 'gt'
+            return queryset.alias(
+                cursor_position=Func(
+                    *(F(name) for name in names),
+                    function='ROW', output_field=Field()
+                )
+            ).filter(**{
+                f'cursor_position__{lookup}': Func(
+                    *(Value(value) for value in values), function='ROW'
+                )
+            })
+
+        condition = Q()
+        equal = {}
+        for name, is_descending, value in zip(names, descending, values):
+            lookup = 'lt' if is_descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return queryset.filter(condition)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = (
+                instance[name] if isinstance(instance, dict)
+                else getattr(instance, name)
+            )
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        return json.dumps(values, separators=(',', ':'))
+
+
+class PopularRecipesCursorPagination(CustomCursorPagination):
+    """
+    Пагинация по ключу (favorites_count, id) для списка рецептов,
+    отсортированного по числу добавлений в избранное (ordering=popular).
+    Рецепт, счетчик которого изменился между запросами страниц, может
+    переместиться относительно курсора.
+    """
+
+    ordering = ('-favorites_count', '-id')
+
+
+class SubscriptionsCursorPagination(CustomCursorPagination):
+    """
+    Пагинация по ключу для списка подписок (ключ - уникальный username).
+    """
+
+    ordering = ('username', 'id')
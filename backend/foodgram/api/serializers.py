@@ -1,14 +1,14 @@
 from django.contrib.auth.password_validation import password_changed
+from django.db import transaction
 from django.db.models import Exists
-from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
 from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
 from users.models import Subscribe, User
 
-from . import services
-from .fields import Base64ImageField
+from . import services, versions
+from .fields import Base64ImageField, ReferenceRelatedField
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -116,7 +116,9 @@ class UserChangePasswordSerializer(serializers.Serializer):
 
         instance.set_password(validated_data['new_password'])
         password_changed(validated_data['new_password'], user=instance)
-        instance.save()
+        # Сохраняется только пароль, чтобы не перезаписать счетчики
+        # пользователя значениями, загруженными до изменения.
+        instance.save(update_fields=['password'])
 
         return instance
 
@@ -142,6 +144,19 @@ class UserChangePasswordSerializer(serializers.Serializer):
         return services.password_verification(value)
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """
+    Сериализатор для проверки списка id рецептов в запросах на добавление
+    рецептов в избранное или список покупок и удаление из них.
+    """
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
 class GetTokenSerializer(serializers.Serializer):
     """
     Сериализатор для обработки запросов на получение токена.
@@ -154,7 +169,11 @@ class GetTokenSerializer(serializers.Serializer):
         """
         Функция проверяет, что предоставленный пользователем email соотвествует
         пользователю в базе данных и указанный пароль корректен для
-        пользователя с указанным e-mail.
+        пользователя с указанным e-mail. Найденный пользователь передается в
+        проверенных данных (ключ user), чтобы не запрашивать его повторно.
+        При успешной проверке check_password пересчитывает хэш пароля, если
+        он получен не первым хэшером из PASSWORD_HASHERS или с устаревшими
+        параметрами.
         """
 
         try:
@@ -165,6 +184,7 @@ class GetTokenSerializer(serializers.Serializer):
             )
 
         if user.check_password(data['password']):
+            data['user'] = user
             return data
         raise serializers.ValidationError(
             'Неверный пароль для пользователя с указанным email.'
@@ -183,6 +203,8 @@ class RecipesMiniSerializers(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_card',
+            'image_thumbnail',
             'cooking_time',
         )
 
@@ -194,7 +216,6 @@ class ListSubscriptionsSerializer(UserSerializer):
     """
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -213,26 +234,26 @@ class ListSubscriptionsSerializer(UserSerializer):
         """
         Функция получает список рецептов пользователя. Отдает ограниченное
         автором запроса число рецептов (recipes_limit), если указано.
+        Рецепты, загруженные заранее в limited_recipes, повторно не
+        запрашиваются.
         """
 
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-
-        recipes = obj.recipes.only('id', 'name', 'image', 'cooking_time')
+        try:
+            recipes = obj.limited_recipes
+        except AttributeError:
+            request = self.context.get('request')
+            limit = request.query_params.get('recipes_limit')
+
+            recipes = obj.recipes.only(
+                'id', 'name', 'image', 'image_card', 'image_thumbnail',
+                'cooking_time'
+            )
 
-        if limit:
-            recipes = recipes[:int(limit)]
+            if limit:
+                recipes = recipes[:int(limit)]
 
         return RecipesMiniSerializers(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        """
-        Функция считает число рецептов у пользователя, на которого подписан
-        автор запроса.
-        """
-
-        return obj.recipes.count()
-
 
 class SubscribeSerializer(serializers.ModelSerializer):
     """
@@ -365,8 +386,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     """
 
     author = UserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
+    tags = ReferenceRelatedField(
+        services.tag_reference, queryset=Tag.objects.all(), many=True
     )
     ingredients = IngredientInRecipeSerializer(
         many=True,
@@ -387,9 +408,12 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_card',
+            'image_thumbnail',
             'text',
             'cooking_time',
         )
+        read_only_fields = ('image_card', 'image_thumbnail')
 
     def get_is_favorited(self, obj):
         """
@@ -423,12 +447,6 @@ class RecipeSerializer(serializers.ModelSerializer):
         if len(value) == 0:
             raise serializers.ValidationError('Укажите теги рецепта.')
 
-        for tag in value:
-            if tag not in Tag.objects.all():
-                raise serializers.ValidationError(
-                    'Указанного тега не существует.'
-                )
-
         return value
 
     def validate_ingredients(self, value):
@@ -437,6 +455,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         словаре присутствуют ингредиенты, существующие в базе данных, и для
         них указано корректное количество (более 0). Также присутствует
         проверка попытки добавления повторяющихся элементов.
+        Все ингредиенты ищутся одним обращением к справочнику ингредиентов.
         """
 
         if len(value) == 0:
@@ -444,10 +463,16 @@ class RecipeSerializer(serializers.ModelSerializer):
                 'Укажите ингредиенты для рецепта.'
             )
 
+        ingredient_ids = [
+            ingredient['ingredient']['id'] for ingredient in value
+        ]
+        existing_ids = services.ingredient_reference.get_many(
+            ingredient_ids
+        ).keys()
+
         set_ingr_id = set()
-        for ingredient in value:
-            ingredient_id = ingredient['ingredient']['id']
-            if not Ingredient.objects.filter(id=ingredient_id).exists():
+        for ingredient_id, ingredient in zip(ingredient_ids, value):
+            if ingredient_id not in existing_ids:
                 raise serializers.ValidationError(
                     f"Ингредиента с id {ingredient_id} нет в базе данных."
                 )
@@ -466,6 +491,18 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return value
 
+    def validate(self, data):
+        """
+        Функция добавляет к данным рецепта уменьшенные варианты загруженного
+        изображения.
+        """
+
+        image = data.get('image')
+        if image is not None:
+            data.update(getattr(image, 'variants', {}))
+
+        return data
+
     def create(self, validated_data):
         """
         Функция для создания рецепта со списком ингредиентов и тегами.
@@ -477,102 +514,68 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return new_recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """
-        Функция для обновления существующего рецепта.
+        Функция для обновления существующего рецепта. Сохраняются только
+        изменившиеся поля, теги и строки ингредиентов; изображение
+        сохраняется, только если было загружено новое.
         """
 
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.image = validated_data.get('image', instance.image)
-        instance.cooking_time = (
-            validated_data.get('cooking_time', instance.cooking_time)
-        )
-        instance.tags.set(validated_data.get('tags', instance.tags))
-        instance.ingredients.clear()
-        instance.save()
-
-        services.add_ingredients_to_recipe(
-            instance, validated_data['ingredient_recipe']
-        )
-        instance.save()
+        update_fields = [
+            field for field in (
+                'name', 'text', 'cooking_time',
+                'image', 'image_card', 'image_thumbnail',
+            )
+            if field in validated_data
+            and validated_data[field] != getattr(instance, field)
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        if update_fields:
+            instance.save(update_fields=update_fields)
+
+        if 'tags' in validated_data:
+            # Теги сравниваются с таблицей связей, а не с копией tag_ids,
+            # которая могла разойтись с ней.
+            old_tags = set(instance.tags.values_list('id', flat=True))
+            new_tags = {tag.id for tag in validated_data['tags']}
+            if old_tags - new_tags:
+                instance.tags.remove(*(old_tags - new_tags))
+            if new_tags - old_tags:
+                instance.tags.add(*(new_tags - old_tags))
+            if old_tags == new_tags and set(instance.tag_ids) != new_tags:
+                services.update_recipe_tag_ids([instance.pk])
+                instance.tag_ids = sorted(new_tags)
+
+        if 'ingredient_recipe' in validated_data:
+            old_ingredients, new_ingredients = (
+                services.set_recipe_ingredients(
+                    instance, validated_data['ingredient_recipe']
+                )
+            )
+            delta = services.get_ingredients_delta(
+                old_ingredients, new_ingredients
+            )
+            if delta:
+                # Строки ингредиентов изменяются массовыми операциями без
+                # сигналов, поэтому версия рецепта обновляется явно.
+                versions.bump(('recipe', instance.pk))
+                services.update_recipe_in_shopping_lists(instance, delta)
 
         return instance
 
     def to_representation(self, instance):
         """
-        Функция для вывода данных сериализатором.
+        Функция для вывода данных сериализатором. Признак подписки на автора,
+        вычисленный аннотацией в запросе рецептов, передается объекту автора,
+        чтобы не запрашивать его отдельно для каждого рецепта.
         """
 
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+
         result = super().to_representation(instance)
         result['tags'] = TagSerielizer(instance.tags.all(), many=True).data
 
         return result
-
-
-class FavoriteShoppingSerializer(serializers.ModelSerializer):
-    """
-    Сериалиализатор для обработки запросов на добавление рецептов в избранное
-    или в список покупок.
-    """
-
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-    type_list = serializers.CharField()
-
-    class Meta:
-        model = User
-        fields = (
-            'recipe',
-            'user',
-            'type_list',
-        )
-
-    def validate(self, data):
-        """
-        Функция для валидации входящих данных.
-        """
-
-        recipe = get_object_or_404(Recipe, id=data['recipe'].id)
-
-        if data['type_list'] == 'favorite':
-            error_text = 'список избранного'
-            condition = User.objects.select_related('favorite_recipes').filter(
-                username=data['user'].username,
-                favorite_recipes=recipe
-            ).exists()
-        if data['type_list'] == 'shopping':
-            error_text = 'список покупок'
-            condition = User.objects.select_related('shopping_recipes').filter(
-                username=data['user'].username,
-                shopping_recipes=recipe
-            ).exists()
-
-        if condition:
-            raise serializers.ValidationError(
-                    f"Рецепт {recipe} уже добавлен в {error_text}."
-            )
-
-        return data
-
-    def create(self, validated_data):
-        """
-        Функция для добавление в список избранного/покупок рецепта.
-        """
-
-        user = validated_data['user']
-        recipe = validated_data['recipe']
-
-        if validated_data['type_list'] == 'favorite':
-            user.favorite_recipes.add(recipe)
-        if validated_data['type_list'] == 'shopping':
-            user.shopping_recipes.add(recipe)
-
-        return recipe
-
-    def to_representation(self, instance):
-        """
-        Функция для вывода данных сериализатором.
-        """
-
-        return RecipesMiniSerializers(instance).data
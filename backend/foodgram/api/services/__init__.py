@@ -1,9 +1,43 @@
-from .add_ingredient import add_ingredients_to_recipe
+from .add_ingredient import add_ingredients_to_recipe, set_recipe_ingredients
+from .counters import change_counter, find_counters_drift, repair_counters
 from .create_pdf import create_pdf
+from .images import get_image_size, process_image
+from .ingredient_search import ingredient_index, search_ingredients
+from .recipe_tags import update_recipe_tag_ids
+from .reference_data import ingredient_reference, tag_reference
+from .shopping_list import (find_shopping_lists_drift, get_ingredients_delta,
+                            get_recipe_ingredients, rebuild_shopping_lists,
+                            update_recipe_in_shopping_lists)
+from .shopping_list_document import (get_shopping_list_document,
+                                     invalidate_shopping_list_documents)
+from .user_lists import (LIST_COUNTERS, add_to_user_list, change_user_list,
+                         remove_from_user_list)
 from .verifications import password_verification
 
 __all__ = [
     'password_verification',
     'create_pdf',
     'add_ingredients_to_recipe',
+    'set_recipe_ingredients',
+    'ingredient_index',
+    'search_ingredients',
+    'tag_reference',
+    'ingredient_reference',
+    'update_recipe_tag_ids',
+    'add_to_user_list',
+    'remove_from_user_list',
+    'change_user_list',
+    'LIST_COUNTERS',
+    'change_counter',
+    'find_counters_drift',
+    'repair_counters',
+    'update_recipe_in_shopping_lists',
+    'get_recipe_ingredients',
+    'get_ingredients_delta',
+    'find_shopping_lists_drift',
+    'rebuild_shopping_lists',
+    'get_shopping_list_document',
+    'invalidate_shopping_list_documents',
+    'get_image_size',
+    'process_image',
 ]
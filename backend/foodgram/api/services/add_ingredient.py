@@ -1,12 +1,16 @@
+from typing import Dict, Tuple
+
 from recipes.models import IngredientInRecipe, Recipe
 
+from .counters import change_counter
+
 
 def add_ingredients_to_recipe(recipe: Recipe, ingredients: dict) -> None:
     """
     Добавляет ингредиенты из словаря ingredients в рецепт recipe.
     """
 
-    IngredientInRecipe.objects.bulk_create(
+    rows = IngredientInRecipe.objects.bulk_create(
             [
                 IngredientInRecipe(
                     ingredient_id=ingredient['ingredient']['id'],
@@ -16,3 +20,47 @@ def add_ingredients_to_recipe(recipe: Recipe, ingredients: dict) -> None:
                 for ingredient in ingredients
             ]
         )
+    change_counter(Recipe, 'ingredients_count', [recipe.id], len(rows))
+
+
+def set_recipe_ingredients(recipe: Recipe,
+                           ingredients: dict) -> Tuple[Dict[int, int],
+                                                       Dict[int, int]]:
+    """
+    Приводит ингредиенты рецепта recipe к списку ingredients, добавляя,
+    изменяя и удаляя только отличающиеся строки, и изменяет счетчик
+    ингредиентов рецепта. Возвращает словари {id ингредиента: количество}
+    до и после изменения.
+    """
+
+    rows = {
+        row.ingredient_id: row
+        for row in IngredientInRecipe.objects.filter(recipe=recipe)
+    }
+    old = {id: row.quantity for id, row in rows.items()}
+    new = {
+        ingredient['ingredient']['id']: ingredient['quantity']
+        for ingredient in ingredients
+    }
+
+    changed = []
+    for id, quantity in new.items():
+        if id in rows and rows[id].quantity != quantity:
+            rows[id].quantity = quantity
+            changed.append(rows[id])
+
+    IngredientInRecipe.objects.filter(
+        id__in=[row.id for id, row in rows.items() if id not in new]
+    ).delete()
+    IngredientInRecipe.objects.bulk_update(changed, ['quantity'])
+    IngredientInRecipe.objects.bulk_create([
+        IngredientInRecipe(ingredient_id=id, quantity=quantity, recipe=recipe)
+        for id, quantity in new.items()
+        if id not in rows
+    ])
+    change_counter(
+        Recipe, 'ingredients_count', [recipe.id],
+        len(new.keys() - old.keys()) - len(old.keys() - new.keys())
+    )
+
+    return old, new
@@ -0,0 +1,99 @@
+from typing import Dict, Iterable
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import Subscribe, User
+
+# Счетчики моделей: {модель: {поле счетчика: (модель связанных записей,
+# поле со ссылкой на объект счетчика)}}.
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (User.favorite_recipes.through, 'recipe_id'),
+        'shopping_count': (User.shopping_recipes.through, 'recipe_id'),
+        'ingredients_count': (IngredientInRecipe, 'recipe_id'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author_id'),
+        'followers_count': (Subscribe, 'user_author_id'),
+    },
+}
+
+
+def change_counter(model, field: str, ids: Iterable[int],
+                   delta: int) -> None:
+    """
+    Изменяет счетчик field объектов model с id из ids (списка или
+    подзапроса) на delta одним запросом UPDATE ... SET field = field + delta,
+    поэтому одновременные изменения не теряются. Счетчик, разошедшийся с
+    данными, не уменьшается ниже нуля до пересчета командой repair_counters.
+    """
+
+    if delta > 0:
+        model.objects.filter(id__in=ids).update(**{field: F(field) + delta})
+    elif delta < 0:
+        model.objects.filter(id__in=ids).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def get_counter_expression(model, field: str) -> Coalesce:
+    """
+    Выражение - число связанных записей, по которым рассчитывается счетчик
+    field объекта model (коррелированный подзапрос с COUNT).
+    """
+
+    source, column = COUNTERS[model][field]
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{column: OuterRef('pk')}).order_by().
+            values(column).annotate(count=Count('*')).values('count')
+        ),
+        0,
+    )
+
+
+def find_counters_drift(model, ids: Iterable[int]) -> Dict[tuple, tuple]:
+    """
+    Сравнивает сохраненные счетчики объектов model с id из ids с
+    рассчитанными по связанным записям. Возвращает словарь {(id объекта,
+    поле счетчика): (сохраненное значение, рассчитанное значение)} для
+    расходящихся счетчиков.
+    """
+
+    fields = list(COUNTERS[model])
+    expected = {
+        f'expected_{field}': get_counter_expression(model, field)
+        for field in fields
+    }
+    rows = (
+        model.objects.filter(id__in=list(ids)).annotate(**expected).
+        order_by().values('id', *fields, *expected)
+    )
+
+    return {
+        (row['id'], field): (row[field], row[f'expected_{field}'])
+        for row in rows
+        for field in fields
+        if row[field] != row[f'expected_{field}']
+    }
+
+
+def repair_counters(model, ids: Iterable[int]) -> Dict[tuple, tuple]:
+    """
+    Пересчитывает расходящиеся счетчики объектов model с id из ids.
+    Возвращает найденные расхождения.
+    """
+
+    with transaction.atomic():
+        drift = find_counters_drift(model, ids)
+        for field in COUNTERS[model]:
+            drifted_ids = [id for id, name in drift if name == field]
+            if drifted_ids:
+                model.objects.filter(id__in=drifted_ids).update(
+                    **{field: get_counter_expression(model, field)}
+                )
+
+    return drift
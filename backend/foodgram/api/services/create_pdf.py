@@ -1,44 +1,91 @@
-import io
-from typing import TextIO
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Iterable
 
+from django.conf import settings
 from reportlab.lib.colors import navy, olive
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+FONTS = {
+    'Open Sans': 'open-sans.ttf',
+    'Open Sans Bold': 'open-sans-bold.ttf',
+}
+TITLE_FONT = ('Open Sans Bold', 20)
+LINE_FONT = ('Open Sans', 14)
+LINE_HEIGHT = 20
+TOP = 810
+BOTTOM = 40
 
-def create_pdf(data: list, title: str) -> TextIO:
+# Документ хранится в памяти, пока его размер не превышает указанного
+# (в байтах), после чего сбрасывается во временный файл на диске.
+SPOOL_MAX_SIZE = 1024 * 1024
+
+_fonts_lock = threading.Lock()
+_fonts_registered = False
+
+
+def register_fonts() -> None:
     """
-    Создает pdf-файл при помощи ReportLab.
+    Регистрирует шрифты документа в ReportLab. Файлы шрифтов разбираются
+    один раз за время жизни процесса.
     """
 
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    pdfmetrics.registerFont(
-        TTFont('Open Sans Bold', './static/open-sans-bold.ttf')
-    )
-    pdfmetrics.registerFont(TTFont('Open Sans', './static/open-sans.ttf'))
+    global _fonts_registered
+
+    if _fonts_registered:
+        return
+
+    with _fonts_lock:
+        if not _fonts_registered:
+            for name, file_name in FONTS.items():
+                pdfmetrics.registerFont(
+                    TTFont(
+                        name,
+                        os.path.join(settings.BASE_DIR, 'static', file_name)
+                    )
+                )
+            _fonts_registered = True
+
+
+def create_pdf(data: Iterable, title: str) -> BinaryIO:
+    """
+    Создает pdf-файл при помощи ReportLab. Строки списка data выводятся
+    с переходом на новую страницу при заполнении текущей. Документ
+    записывается во временный файл, который отдается FileResponse
+    по частям; небольшие документы не покидают оперативную память.
+    """
+
+    register_fonts()
+
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    p = canvas.Canvas(file, pagesize=A4)
 
-    p.setFont('Open Sans Bold', 20)
-    y = 810
+    p.setFont(*TITLE_FONT)
+    y = TOP
     p.setFillColor(olive)
     p.drawString(55, y, f'{title}')
     y -= 30
 
-    p.setFont('Open Sans', 14)
+    p.setFont(*LINE_FONT)
     p.setFillColor(navy)
-    string_number = 1
-    for i in data:
+    for string_number, i in enumerate(data, start=1):
+        if y < BOTTOM:
+            p.showPage()
+            p.setFont(*LINE_FONT)
+            p.setFillColor(navy)
+            y = TOP
         p.drawString(
             15, y,
             f'{string_number}. {i[0].capitalize()} ({i[1]}) - {i[2]}'
         )
-        y -= 20
-        string_number += 1
+        y -= LINE_HEIGHT
 
     p.showPage()
     p.save()
-    buffer.seek(0)
+    file.seek(0)
 
-    return buffer
+    return file
@@ -0,0 +1,68 @@
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+IMAGE_FORMAT = getattr(settings, 'IMAGE_FORMAT', 'WEBP')
+IMAGE_QUALITY = getattr(settings, 'IMAGE_QUALITY', 85)
+IMAGE_VARIANTS = getattr(settings, 'IMAGE_VARIANTS', {
+    'image': (1280, 1280),
+    'image_card': (600, 600),
+    'image_thumbnail': (160, 160),
+})
+
+# Изменение размера и кодирование изображений в Pillow выполняются без
+# удержания GIL, поэтому варианты изображения формируются параллельно
+# в пуле потоков.
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_WORKERS', None) or os.cpu_count(),
+    thread_name_prefix='image',
+)
+
+
+def get_image_size(data: bytes) -> Tuple[int, int]:
+    """
+    Возвращает ширину и высоту изображения, прочитав только его заголовок.
+    """
+
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+
+def _render_variant(image: Image.Image, size: Tuple[int, int],
+                    file_name: str) -> ContentFile:
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    variant.save(buffer, IMAGE_FORMAT, quality=IMAGE_QUALITY)
+
+    return ContentFile(buffer.getvalue(), name=file_name)
+
+
+def process_image(data: bytes) -> Dict[str, ContentFile]:
+    """
+    Перекодирует изображение в формат IMAGE_FORMAT и формирует его варианты,
+    уменьшенные до размеров из IMAGE_VARIANTS. Возвращает словарь
+    {имя варианта: файл}.
+    """
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    file_name = str(uuid.uuid4())[:12]
+    extension = IMAGE_FORMAT.lower()
+    futures = {
+        variant: executor.submit(
+            _render_variant, image, size, f'{file_name}.{extension}'
+        )
+        for variant, size in IMAGE_VARIANTS.items()
+    }
+
+    return {variant: future.result() for variant, future in futures.items()}
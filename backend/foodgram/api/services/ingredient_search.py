@@ -0,0 +1,94 @@
+import bisect
+import threading
+from typing import List, NamedTuple, Optional
+
+from .reference_data import ReferenceData, Snapshot, ingredient_reference
+
+
+class IngredientEntry(NamedTuple):
+    """
+    Запись индекса ингредиентов: ключ поиска (имя в нижнем регистре) и
+    данные, необходимые для выдачи ингредиента в API.
+    """
+
+    key: str
+    id: int
+    name: str
+    measurement_unit: str
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения по имени.
+    Хранит отсортированный по имени массив записей: совпадения по началу
+    имени находятся двоичным поиском, вхождения подстроки - проходом по
+    массиву без обращения к базе данных.
+    Индекс строится по справочнику ингредиентов reference_data и
+    перестраивается, когда справочник загружается заново.
+    """
+
+    def __init__(self, reference_data: ReferenceData):
+        self.reference_data = reference_data
+        self._lock = threading.Lock()
+        self._source = None
+        self._data = None
+
+    def _build(self, snapshot: Snapshot) -> tuple:
+        entries = sorted(
+            IngredientEntry(
+                ingredient.name.lower(),
+                ingredient.id,
+                ingredient.name,
+                ingredient.measurement_unit
+            )
+            for ingredient in snapshot.objects
+        )
+        return entries, [entry.key for entry in entries]
+
+    def _get_data(self) -> tuple:
+        snapshot = self.reference_data.get_snapshot()
+        if self._source is not snapshot:
+            with self._lock:
+                if self._source is not snapshot:
+                    self._data = self._build(snapshot)
+                    self._source = snapshot
+        return self._data
+
+    def search(self, query: str,
+               limit: Optional[int] = None) -> List[IngredientEntry]:
+        """
+        Возвращает ингредиенты, имя которых начинается с query, а за ними -
+        ингредиенты, имя которых содержит query. Поиск без учета регистра,
+        limit ограничивает число результатов.
+        """
+
+        entries, keys = self._get_data()
+        query = query.strip().lower()
+
+        start = bisect.bisect_left(keys, query)
+        stop = len(keys) if limit is None else min(len(keys), start + limit)
+        end = start
+        while end < stop and keys[end].startswith(query):
+            end += 1
+        result = entries[start:end]
+
+        if query:
+            for entry in entries:
+                if limit is not None and len(result) >= limit:
+                    break
+                if query in entry.key and not entry.key.startswith(query):
+                    result.append(entry)
+
+        return result
+
+
+ingredient_index = IngredientIndex(ingredient_reference)
+
+
+def search_ingredients(query: str,
+                       limit: Optional[int] = None) -> List[IngredientEntry]:
+    """
+    Поиск ингредиентов по имени для автодополнения.
+    """
+
+    return ingredient_index.search(query, limit)
@@ -0,0 +1,32 @@
+from typing import Iterable
+
+from django.db.models import Func, OuterRef, Subquery
+
+from recipes.models import Recipe
+
+
+def get_tag_ids_expression() -> Func:
+    """
+    Выражение ARRAY(SELECT tag_id ...) - массив id тегов рецепта по
+    таблице связей рецептов и тегов. Порядок элементов не гарантируется:
+    фильтры используют операторы пересечения и вхождения массивов.
+    """
+
+    return Func(
+        Subquery(
+            Recipe.tags.through.objects.filter(recipe_id=OuterRef('pk')).
+            values('tag_id')
+        ),
+        template='ARRAY%(expressions)s',
+    )
+
+
+def update_recipe_tag_ids(recipe_ids: Iterable[int]) -> None:
+    """
+    Пересчитывает поле tag_ids рецептов с id из recipe_ids (списка или
+    подзапроса) по таблице связей рецептов и тегов одним запросом UPDATE.
+    """
+
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        tag_ids=get_tag_ids_expression()
+    )
@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import models
+
+from recipes.models import Ingredient, Tag
+
+from .. import versions
+
+
+class Snapshot(NamedTuple):
+    """
+    Снимок справочника: версия данных, на момент которой он построен, время
+    построения (time.monotonic), объекты в порядке сортировки модели,
+    словарь {id: объект} и словари {значение поля: id} для полей поиска.
+    """
+
+    version: int
+    built_at: float
+    objects: List[models.Model]
+    by_id: Dict[int, models.Model]
+    lookups: Dict[str, Dict[object, int]]
+
+
+class ReferenceData:
+    """
+    Кэш справочника (редко изменяемой таблицы) в памяти процесса.
+    Справочник загружается из базы данных целиком при первом обращении и
+    перезагружается, если изменилась версия данных version_name в общем
+    кэше (api.versions). Версия увеличивается сигналами при изменении
+    записей, поэтому при общем для процессов бэкенде кэша изменения,
+    сделанные в любом процессе (например, через админку), сразу становятся
+    видны во всех процессах. Кроме того, справочник загружается заново по
+    истечении ttl секунд: так видны изменения из других процессов при кэше
+    в памяти процесса (LocMemCache) и изменения, сделанные без сигналов.
+    Возвращаемые объекты общие для всех запросов и не должны изменяться.
+    """
+
+    def __init__(self, model, version_name: Tuple,
+                 lookup_fields: Iterable[str] = (), ttl: int = 0):
+        self.model = model
+        self.version_name = version_name
+        self.lookup_fields = tuple(lookup_fields)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def __deepcopy__(self, memo):
+        # Справочник общий для процесса и не копируется вместе с полями
+        # сериализаторов, которые на него ссылаются.
+        return self
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def _build(self, version: int) -> Snapshot:
+        objects = list(self.model.objects.all())
+        return Snapshot(
+            version,
+            time.monotonic(),
+            objects,
+            {obj.pk: obj for obj in objects},
+            {
+                field: {getattr(obj, field): obj.pk for obj in objects}
+                for field in self.lookup_fields
+            },
+        )
+
+    def _is_stale(self, snapshot: Optional[Snapshot], version: int) -> bool:
+        return snapshot is None or snapshot.version != version or (
+            bool(self.ttl) and time.monotonic() - snapshot.built_at > self.ttl
+        )
+
+    def get_snapshot(self) -> Snapshot:
+        # Версия читается до загрузки данных: если данные изменятся во время
+        # загрузки, при следующем обращении версия не совпадет и справочник
+        # будет загружен заново.
+        version, = versions.get_versions(self.version_name)
+        snapshot = self._snapshot
+        if self._is_stale(snapshot, version):
+            with self._lock:
+                snapshot = self._snapshot
+                if self._is_stale(snapshot, version):
+                    snapshot = self._snapshot = self._build(version)
+        return snapshot
+
+    def all(self) -> List[models.Model]:
+        return self.get_snapshot().objects
+
+    def get(self, pk: int) -> Optional[models.Model]:
+        return self.get_snapshot().by_id.get(pk)
+
+    def get_many(self, pks: Iterable[int]) -> Dict[int, models.Model]:
+        """
+        Возвращает словарь {id: объект} для найденных id. Отсутствующие в
+        справочнике id ищутся одним запросом к базе данных: запись могла
+        быть добавлена в транзакции, еще не зафиксированной на момент
+        загрузки справочника.
+        """
+
+        by_id = self.get_snapshot().by_id
+        found = {pk: by_id[pk] for pk in pks if pk in by_id}
+        missing = set(pks) - found.keys()
+        if missing:
+            found.update(self.model.objects.in_bulk(missing))
+        return found
+
+    def get_id(self, field: str, value) -> Optional[int]:
+        """
+        Возвращает id объекта со значением value поля field из
+        lookup_fields.
+        """
+
+        return self.get_snapshot().lookups[field].get(value)
+
+
+REFERENCE_DATA_TTL = getattr(settings, 'REFERENCE_DATA_TTL', 0)
+
+tag_reference = ReferenceData(
+    Tag, ('tag',), lookup_fields=('slug',), ttl=REFERENCE_DATA_TTL
+)
+ingredient_reference = ReferenceData(
+    Ingredient, ('ingredient',), ttl=REFERENCE_DATA_TTL
+)
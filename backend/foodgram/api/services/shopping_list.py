@@ -0,0 +1,180 @@
+from collections import Counter
+from typing import Dict, Iterable
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import ShoppingListIngredient
+
+from .shopping_list_document import invalidate_shopping_list_documents
+
+
+def get_recipe_ingredients(recipe: Recipe) -> Dict[int, int]:
+    """
+    Возвращает словарь {id ингредиента: количество} для рецепта recipe.
+    """
+
+    return dict(
+        IngredientInRecipe.objects.filter(recipe=recipe).
+        values_list('ingredient_id', 'quantity').
+        order_by()
+    )
+
+
+def get_ingredients_delta(old: Dict[int, int],
+                          new: Dict[int, int]) -> Dict[int, int]:
+    """
+    Вычисляет изменение количеств ингредиентов между словарями old и new.
+    """
+
+    delta = Counter(new)
+    delta.subtract(old)
+
+    return {id: diff for id, diff in delta.items() if diff}
+
+
+def update_shopping_lists(user_ids: Iterable[int],
+                          delta: Dict[int, int]) -> None:
+    """
+    Применяет изменение количеств ингредиентов delta к сводным спискам
+    покупок пользователей с id из user_ids одним запросом UPDATE
+    (SET amount = amount + CASE ingredient_id WHEN ... END). Ингредиенты,
+    количество которых стало нулевым, удаляются из списка.
+    """
+
+    user_ids = list(user_ids)
+    delta = {id: diff for id, diff in delta.items() if diff}
+
+    if not user_ids or not delta:
+        return
+
+    with transaction.atomic():
+        # Строки добавляются в порядке id пользователя и ингредиента, чтобы
+        # параллельные изменения одного списка не блокировали друг друга
+        # взаимно.
+        ShoppingListIngredient.objects.bulk_create(
+            [
+                ShoppingListIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=0
+                )
+                for user_id in sorted(user_ids)
+                for ingredient_id, diff in sorted(delta.items())
+                if diff > 0
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        shopping_list = ShoppingListIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=delta
+        )
+        shopping_list.update(amount=F('amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(diff))
+                for ingredient_id, diff in delta.items()
+            ),
+            output_field=IntegerField()
+        ))
+        shopping_list.filter(amount__lte=0).delete()
+
+    invalidate_shopping_list_documents(user_ids)
+
+
+def get_recipes_ingredients(recipe_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Возвращает словарь {id ингредиента: суммарное количество} для рецептов
+    с id из recipe_ids.
+    """
+
+    return dict(
+        IngredientInRecipe.objects.filter(recipe_id__in=list(recipe_ids)).
+        values('ingredient_id').
+        annotate(amount=Sum('quantity')).
+        values_list('ingredient_id', 'amount').
+        order_by()
+    )
+
+
+def update_recipe_in_shopping_lists(recipe: Recipe,
+                                    delta: Dict[int, int]) -> None:
+    """
+    Применяет изменение ингредиентов рецепта recipe к спискам покупок всех
+    пользователей, у которых рецепт находится в списке покупок.
+    """
+
+    if delta:
+        update_shopping_lists(
+            recipe.shoppings.values_list('id', flat=True), delta
+        )
+
+
+def calculate_shopping_lists(user_ids: Iterable[int]) -> Dict[tuple, int]:
+    """
+    Рассчитывает по рецептам в списках покупок сводные списки покупок
+    пользователей с id из user_ids в виде словаря {(id пользователя,
+    id ингредиента): количество}.
+    """
+
+    return {
+        (row['recipe__shoppings'], row['ingredient_id']): row['amount']
+        for row in IngredientInRecipe.objects.
+        filter(recipe__shoppings__in=list(user_ids)).
+        values('recipe__shoppings', 'ingredient_id').
+        annotate(amount=Sum('quantity')).
+        filter(amount__gt=0).
+        order_by()
+    }
+
+
+def find_shopping_lists_drift(user_ids: Iterable[int]) -> Dict[tuple, tuple]:
+    """
+    Сравнивает сохраненные сводные списки покупок пользователей с id из
+    user_ids с рассчитанными. Возвращает словарь {(id пользователя,
+    id ингредиента): (сохраненное количество, рассчитанное количество)} для
+    расходящихся записей.
+    """
+
+    user_ids = list(user_ids)
+    expected = calculate_shopping_lists(user_ids)
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in
+        ShoppingListIngredient.objects.filter(user_id__in=user_ids).
+        values_list('user_id', 'ingredient_id', 'amount')
+    }
+
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) != expected.get(key)
+    }
+
+
+def rebuild_shopping_lists(user_ids: Iterable[int]) -> Dict[tuple, tuple]:
+    """
+    Пересобирает сводные списки покупок пользователей с id из user_ids, в
+    которых найдены расхождения. Возвращает найденные расхождения.
+    """
+
+    with transaction.atomic():
+        drift = find_shopping_lists_drift(user_ids)
+        drifted_users = {user_id for user_id, _ in drift}
+
+        if drifted_users:
+            ShoppingListIngredient.objects.filter(
+                user_id__in=drifted_users
+            ).delete()
+            ShoppingListIngredient.objects.bulk_create(
+                [
+                    ShoppingListIngredient(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        amount=amount
+                    )
+                    for (user_id, ingredient_id), amount in
+                    calculate_shopping_lists(drifted_users).items()
+                ],
+                batch_size=1000
+            )
+            invalidate_shopping_list_documents(drifted_users)
+
+    return drift
@@ -0,0 +1,82 @@
+import hashlib
+import io
+import os
+from typing import BinaryIO, Iterable
+
+from django.conf import settings
+
+from users.models import User
+
+from ..cache import LRUCache
+from .create_pdf import create_pdf
+
+SHOPPING_LIST_TITLE = 'Список покупок'
+
+# Сформированные документы по ключу, вычисленному из содержимого списка
+# покупок и формата документа. Одинаковые списки разных пользователей
+# используют один документ.
+documents = LRUCache(
+    max_size=getattr(settings, 'SHOPPING_LIST_CACHE_SIZE', 0),
+    sizeof=len
+)
+# Документы большего размера (в байтах) не кэшируются.
+MAX_DOCUMENT_SIZE = getattr(
+    settings, 'SHOPPING_LIST_CACHE_MAX_DOCUMENT_SIZE', 40 * 1024
+)
+# Ключ последнего документа, выданного пользователю, для освобождения
+# записи при изменении его списка покупок.
+user_documents = LRUCache(max_size=10000)
+
+
+def get_document_key(shopping_list: list, format: str) -> str:
+    """
+    Вычисляет ключ документа по содержимому списка покупок и формату.
+    """
+
+    return hashlib.sha256(
+        repr((format, shopping_list)).encode()
+    ).hexdigest()
+
+
+def get_shopping_list_document(user: User,
+                               format: str = 'pdf') -> BinaryIO:
+    """
+    Возвращает файл с документом со списком покупок пользователя user.
+    Документы размером не более MAX_DOCUMENT_SIZE кэшируются и формируются
+    заново, только если список покупок изменился; документы большего
+    размера возвращаются временным файлом create_pdf без чтения в память.
+    """
+
+    shopping_list = list(
+        user.shopping_list.
+        values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).
+        order_by('ingredient_id')
+    )
+    key = get_document_key(shopping_list, format)
+
+    document = documents.get(key)
+    if document is None:
+        file = create_pdf(shopping_list, SHOPPING_LIST_TITLE)
+        size = file.seek(0, os.SEEK_END)
+        file.seek(0)
+        if not documents.max_size or size > MAX_DOCUMENT_SIZE:
+            return file
+        with file:
+            document = file.read()
+        documents.set(key, document)
+    user_documents.set(user.id, key)
+
+    return io.BytesIO(document)
+
+
+def invalidate_shopping_list_documents(user_ids: Iterable[int]) -> None:
+    """
+    Удаляет из кэша документы, выданные пользователям с id из user_ids.
+    """
+
+    for user_id in user_ids:
+        key = user_documents.delete(user_id)
+        if key is not None:
+            documents.delete(key)
@@ -0,0 +1,141 @@
+from typing import Dict, Iterable, List
+
+from django.db import connection, transaction
+
+from recipes.models import Recipe
+from users.models import User
+
+from .. import versions
+from .counters import change_counter
+from .shopping_list import get_recipes_ingredients, update_shopping_lists
+
+USER_LISTS = {
+    'favorite': User.favorite_recipes,
+    'shopping': User.shopping_recipes,
+}
+
+# Счетчики рецептов, соответствующие спискам пользователей.
+LIST_COUNTERS = {
+    'favorite': 'favorites_count',
+    'shopping': 'shopping_count',
+}
+
+
+def _get_table(list_name: str) -> tuple:
+    """
+    Возвращает имя промежуточной таблицы списка list_name и имена ее
+    столбцов с id пользователя и id рецепта.
+    """
+
+    field = USER_LISTS[list_name].field
+    quote_name = connection.ops.quote_name
+    return (
+        quote_name(field.m2m_db_table()),
+        quote_name(field.m2m_column_name()),
+        quote_name(field.m2m_reverse_name()),
+    )
+
+
+def _apply_to_shopping_list(user: User, recipe_ids: List[int],
+                            sign: int) -> None:
+    delta = get_recipes_ingredients(recipe_ids)
+    update_shopping_lists(
+        [user.id], {id: sign * amount for id, amount in delta.items()}
+    )
+
+
+def add_to_user_list(user: User, list_name: str,
+                     recipe_ids: Iterable[int]) -> List[int]:
+    """
+    Добавляет рецепты с id из recipe_ids в список list_name ('favorite' или
+    'shopping') пользователя user одним запросом INSERT ... ON CONFLICT DO
+    NOTHING. Возвращает id добавленных рецептов: несуществующие рецепты и
+    рецепты, уже находящиеся в списке, пропускаются, поэтому при
+    одновременных запросах рецепт добавляется ровно один раз. Счетчики
+    добавленных рецептов увеличиваются в той же транзакции.
+    """
+
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+
+    table, user_column, recipe_column = _get_table(list_name)
+    recipes_table = connection.ops.quote_name(Recipe._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {recipe_column}) '
+            f'SELECT %s, id FROM {recipes_table} '
+            f"WHERE id IN ({', '.join(['%s'] * len(recipe_ids))}) "
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            [user.id, *recipe_ids]
+        )
+        added = [row[0] for row in cursor.fetchall()]
+        change_counter(Recipe, LIST_COUNTERS[list_name], added, 1)
+        if added and list_name == 'shopping':
+            _apply_to_shopping_list(user, added, 1)
+
+    if added:
+        versions.bump(('user-lists', user.id))
+    return added
+
+
+def remove_from_user_list(user: User, list_name: str,
+                          recipe_ids: Iterable[int]) -> List[int]:
+    """
+    Удаляет рецепты с id из recipe_ids из списка list_name пользователя user
+    одним запросом DELETE ... RETURNING. Возвращает id удаленных рецептов.
+    """
+
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+
+    table, user_column, recipe_column = _get_table(list_name)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f"AND {recipe_column} IN ({', '.join(['%s'] * len(recipe_ids))}) "
+            f'RETURNING {recipe_column}',
+            [user.id, *recipe_ids]
+        )
+        removed = [row[0] for row in cursor.fetchall()]
+        change_counter(Recipe, LIST_COUNTERS[list_name], removed, -1)
+        if removed and list_name == 'shopping':
+            _apply_to_shopping_list(user, removed, -1)
+
+    if removed:
+        versions.bump(('user-lists', user.id))
+    return removed
+
+
+def change_user_list(user: User, list_name: str, recipe_ids: Iterable[int],
+                     add: bool = True) -> Dict[int, str]:
+    """
+    Добавляет рецепты с id из recipe_ids в список list_name пользователя
+    user (или удаляет из него при add=False) в одной транзакции. Возвращает
+    словарь {id рецепта: результат} в порядке recipe_ids, где результат -
+    'added'/'removed', 'already_added'/'not_in_list' или 'not_found'.
+    """
+
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+
+    with transaction.atomic():
+        if add:
+            changed = set(add_to_user_list(user, list_name, recipe_ids))
+        else:
+            changed = set(remove_from_user_list(user, list_name, recipe_ids))
+        unchanged = [id for id in recipe_ids if id not in changed]
+        existing = set(
+            Recipe.objects.filter(id__in=unchanged).
+            values_list('id', flat=True)
+        ) if unchanged else set()
+
+    results = {}
+    for id in recipe_ids:
+        if id in changed:
+            results[id] = 'added' if add else 'removed'
+        elif id in existing:
+            results[id] = 'already_added' if add else 'not_in_list'
+        else:
+            results[id] = 'not_found'
+    return results
@@ -0,0 +1,217 @@
+"""
+Обработчики сигналов моделей, увеличивающие счетчики версий данных. По
+счетчикам вычисляются ETag и проверяется актуальность справочников,
+кэшируемых в памяти процессов. Также здесь поддерживаются копия id тегов
+рецепта в поле Recipe.tag_ids и счетчики рецептов и пользователей при
+изменениях через ORM (сервисы api.services, выполняющие массовые операции
+без сигналов, изменяют счетчики сами).
+"""
+
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import Subscribe, User
+
+from . import services, versions
+from .authentication import evict_token
+
+# Промежуточные модели списков пользователей и названия списков.
+USER_LISTS = {
+    User.favorite_recipes.through: 'favorite',
+    User.shopping_recipes.through: 'shopping',
+}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredient_version(sender, **kwargs):
+    versions.bump(('ingredient',))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tag_version(sender, **kwargs):
+    versions.bump(('tag',))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_version(sender, instance, **kwargs):
+    versions.bump(('recipe', instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        services.change_counter(User, 'recipes_count', [instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    services.change_counter(User, 'recipes_count', [instance.author_id], -1)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def bump_recipe_ingredients_version(sender, instance, **kwargs):
+    versions.bump(('recipe', instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_version(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        versions.bump(('recipe', instance.pk))
+    elif pk_set:
+        versions.bump(*(('recipe', pk) for pk in pk_set))
+    else:
+        versions.bump(*(
+            ('recipe', pk)
+            for pk in instance.recipes.values_list('pk', flat=True)
+        ))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_recipe_tag_ids(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        services.update_recipe_tag_ids([instance.pk])
+        # Значение у объекта обновляется без запроса, чтобы последующее
+        # сохранение объекта не записало устаревший массив.
+        if action == 'post_clear':
+            instance.tag_ids = []
+        elif action == 'post_add':
+            instance.tag_ids = sorted(set(instance.tag_ids) | pk_set)
+        else:
+            instance.tag_ids = sorted(set(instance.tag_ids) - pk_set)
+    elif action == 'post_clear':
+        # Связи уже удалены, поэтому рецепты тега находятся по tag_ids.
+        services.update_recipe_tag_ids(
+            Recipe.objects.filter(tag_ids__contains=[instance.pk]).
+            values('id')
+        )
+    elif pk_set:
+        services.update_recipe_tag_ids(pk_set)
+
+
+@receiver(post_delete, sender=Tag)
+def remove_deleted_tag_id(sender, instance, **kwargs):
+    # Связи удаленного тега удаляются каскадно без сигнала m2m_changed.
+    services.update_recipe_tag_ids(
+        Recipe.objects.filter(tag_ids__contains=[instance.pk]).values('id')
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_users_version(sender, instance, update_fields=None, **kwargs):
+    # Версия пользователя проверяется при аутентификации по кэшированному
+    # токену, поэтому, например, смена пароля сбрасывает токены из кэша, и
+    # входит в ETag рецептов пользователя. Время последнего входа,
+    # сохраняемое при каждом входе, не влияет ни на то, ни на другое.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    versions.bump(('user', instance.pk))
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    evict_token(instance.key)
+
+
+@receiver(m2m_changed, sender=User.favorite_recipes.through)
+@receiver(m2m_changed, sender=User.shopping_recipes.through)
+def bump_user_lists_version(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        versions.bump(('user-lists', instance.pk))
+    elif pk_set:
+        versions.bump(*(('user-lists', pk) for pk in pk_set))
+
+
+@receiver(m2m_changed, sender=User.favorite_recipes.through)
+@receiver(m2m_changed, sender=User.shopping_recipes.through)
+def update_user_lists_counters(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    field = services.LIST_COUNTERS[USER_LISTS[sender]]
+    if action == 'post_add':
+        # pk_set содержит только действительно добавленные объекты.
+        if not reverse:
+            services.change_counter(Recipe, field, pk_set, 1)
+        else:
+            services.change_counter(Recipe, field, [instance.pk], len(pk_set))
+    elif action in ('pre_remove', 'pre_clear'):
+        # Удаляемые строки выбираются до удаления в той же транзакции:
+        # pk_set при remove может содержать объекты не из списка.
+        rows = sender.objects.filter(
+            **{'recipe_id' if reverse else 'user_id': instance.pk}
+        )
+        if action == 'pre_remove':
+            rows = rows.filter(
+                **{'user_id__in' if reverse else 'recipe_id__in': pk_set}
+            )
+        if not reverse:
+            services.change_counter(
+                Recipe, field, rows.values('recipe_id'), -1
+            )
+        else:
+            services.change_counter(
+                Recipe, field, [instance.pk], -rows.count()
+            )
+
+
+@receiver(pre_delete, sender=User)
+def release_user_lists_counters(sender, instance, **kwargs):
+    # Строки избранного и списка покупок удаляются вместе с пользователем
+    # без сигнала m2m_changed.
+    for through, list_name in USER_LISTS.items():
+        services.change_counter(
+            Recipe, services.LIST_COUNTERS[list_name],
+            through.objects.filter(user_id=instance.pk).values('recipe_id'),
+            -1
+        )
+
+
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def bump_subscriptions_version(sender, instance, **kwargs):
+    versions.bump(('user-lists', instance.user_id))
+
+
+@receiver(post_save, sender=Subscribe)
+def increase_followers_count(sender, instance, created, **kwargs):
+    if created:
+        services.change_counter(
+            User, 'followers_count', [instance.user_author_id], 1
+        )
+
+
+@receiver(m2m_changed, sender=Subscribe)
+def increase_followers_count_on_add(sender, instance, action, reverse,
+                                    pk_set, **kwargs):
+    # Подписки, добавленные через User.subscribing.add(), создаются
+    # массово без сигнала post_save; удаление отправляет post_delete.
+    if action != 'post_add':
+        return
+    if not reverse:
+        services.change_counter(User, 'followers_count', pk_set, 1)
+    else:
+        services.change_counter(
+            User, 'followers_count', [instance.pk], len(pk_set)
+        )
+
+
+@receiver(post_delete, sender=Subscribe)
+def decrease_followers_count(sender, instance, **kwargs):
+    services.change_counter(
+        User, 'followers_count', [instance.user_author_id], -1
+    )
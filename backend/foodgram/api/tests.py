@@ -0,0 +1,870 @@
+import base64
+import io
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import ShoppingListIngredient, Subscribe, User
+
+from . import services, versions
+from .authentication import CachedTokenAuthentication, tokens
+from .serializers import RecipeSerializer
+from .services.reference_data import ReferenceData
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name='Имя', last_name='Фамилия', password='password-123',
+        **kwargs
+    )
+
+
+def create_recipe(author, name, tags=(), ingredients=None, **kwargs):
+    kwargs.setdefault('cooking_time', 10)
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', image='images/recipe.png',
+        **kwargs
+    )
+    recipe.tags.set(tags)
+    services.add_ingredients_to_recipe(recipe, [
+        {'ingredient': {'id': ingredient.id}, 'quantity': quantity}
+        for ingredient, quantity in (ingredients or {}).items()
+    ])
+    return recipe
+
+
+def create_tags(*slugs):
+    return [
+        Tag.objects.create(name=slug, color='#e26c2d', slug=slug)
+        for slug in slugs
+    ]
+
+
+def get_image_data():
+    file = io.BytesIO()
+    Image.new('RGB', (8, 8), 'orange').save(file, 'PNG')
+    return (
+        'data:image/png;base64,' + base64.b64encode(file.getvalue()).decode()
+    )
+
+
+def get_updated_tables(queries):
+    return [
+        query['sql'].split('"')[1] for query in queries
+        if query['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))
+    ]
+
+
+class RecipeQueriesTest(TestCase):
+    """
+    Число запросов к базе данных при выдаче списка рецептов и рецепта не
+    зависит от размера страницы: рецепты с авторами, теги, ингредиенты (и
+    для списка - COUNT(*) пагинации). При общих счетчиках версий для ETag
+    рецепта добавляется запрос автора рецепта.
+    """
+
+    LIST_QUERIES = 4
+    DETAIL_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_dataset', users=20, recipes=60, stdout=io.StringIO()
+        )
+        cls.user = User.objects.filter(subscriber__isnull=False).first()
+        cls.recipe = Recipe.objects.filter(
+            author__author__user=cls.user
+        ).first()
+
+    def setUp(self):
+        self.anonymous_client = APIClient()
+        self.user_client = APIClient()
+        self.user_client.force_authenticate(self.user)
+
+    def test_list_queries(self):
+        for client in (self.anonymous_client, self.user_client):
+            for limit in (5, 50):
+                with self.subTest(user=client is self.user_client,
+                                  limit=limit):
+                    with self.assertNumQueries(self.LIST_QUERIES):
+                        response = client.get(f'/api/recipes/?limit={limit}')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_detail_queries(self):
+        for shared, queries in ((False, self.DETAIL_QUERIES),
+                                (True, self.DETAIL_QUERIES + 1)):
+            for client in (self.anonymous_client, self.user_client):
+                with self.subTest(user=client is self.user_client,
+                                  shared=shared), \
+                        override_settings(VERSIONS_SHARED=shared):
+                    with self.assertNumQueries(queries):
+                        response = client.get(
+                            f'/api/recipes/{self.recipe.id}/'
+                        )
+                    self.assertEqual(response.status_code, 200)
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql', 'Схема базы данных - для PostgreSQL'
+)
+class QueryPlansTest(TestCase):
+    """
+    Проверка планов выполнения основных запросов API командой
+    check_query_plans. Набора данных достаточно, чтобы планировщик выбирал
+    последовательное сканирование только для небольших таблиц (тегов,
+    ингредиентов), а таблицы не меньше MIN_ROWS строк читал по индексам.
+    """
+
+    MIN_ROWS = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_dataset', users=300, recipes=3000,
+            stdout=io.StringIO()
+        )
+
+    def test_query_plans_use_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        output = io.StringIO()
+        try:
+            call_command(
+                'check_query_plans', min_rows=self.MIN_ROWS, stdout=output
+            )
+        except CommandError as error:
+            self.fail(f'{error}\n{output.getvalue()}')
+
+
+class ReferenceDataTest(TestCase):
+    """
+    Справочник в памяти процесса загружается заново при изменении версии
+    данных и по истечении ttl, если версия не изменилась (изменения из
+    других процессов при кэше в памяти процесса, массовые операции).
+    """
+
+    def setUp(self):
+        self.reference = ReferenceData(
+            Tag, ('tag',), lookup_fields=('slug',), ttl=60
+        )
+
+    def test_reload_on_version_change(self):
+        self.assertIsNone(self.reference.get_id('slug', 'lunch'))
+        tag = Tag.objects.create(name='Обед', color='#49b64e', slug='lunch')
+        self.assertEqual(self.reference.get_id('slug', 'lunch'), tag.id)
+
+    def test_reload_after_ttl(self):
+        self.assertEqual(self.reference.all(), [])
+        Tag.objects.bulk_create(
+            [Tag(name='Обед', color='#49b64e', slug='lunch')]
+        )
+        self.assertEqual(self.reference.all(), [])
+
+        expired = time.monotonic() + 61
+        with mock.patch('time.monotonic', return_value=expired):
+            self.assertEqual(
+                [tag.slug for tag in self.reference.all()], ['lunch']
+            )
+
+
+@override_settings(VERSIONS_SHARED=True)
+class ConditionalGetTest(TestCase):
+    """
+    Ответы 304 на условные запросы рецепта по ETag.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipe = create_recipe(cls.author, 'Рецепт')
+        cls.url = f'/api/recipes/{cls.recipe.id}/'
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertNotModified(self, etag):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def assertModified(self, etag):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertNotModified(etag)
+
+        self.recipe.cooking_time = 20
+        self.recipe.save()
+        self.assertModified(etag)
+
+    def test_author_change(self):
+        etag = self.client.get(self.url)['ETag']
+
+        # Вход пользователя и изменения других пользователей не меняют
+        # ETag рецепта.
+        self.author.last_login = timezone.now()
+        self.author.save(update_fields=['last_login'])
+        create_user('other').save()
+        self.assertNotModified(etag)
+
+        self.author.first_name = 'Другое имя'
+        self.author.save()
+        self.assertModified(etag)
+
+    def test_invalid_pk(self):
+        for pk in ('abc', '999999'):
+            with self.subTest(pk=pk):
+                response = self.client.get(
+                    f'/api/recipes/{pk}/', HTTP_IF_NONE_MATCH='*'
+                )
+                self.assertEqual(response.status_code, 404)
+                self.assertIsNone(
+                    cache.get(versions._get_key(('recipe', pk)))
+                )
+
+    @override_settings(VERSIONS_SHARED=False)
+    def test_not_shared_versions(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """
+    Кэширование токенов аутентификации и их отзыв при выходе.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+
+    def setUp(self):
+        tokens.clear()
+        self.client = APIClient()
+        response = self.client.post(
+            '/api/auth/token/login/',
+            {'email': 'user@example.com', 'password': 'password-123'}
+        )
+        self.key = response.data['auth_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def test_cached_token(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        self.assertIsNotNone(tokens.get(self.key))
+
+        with self.assertNumQueries(0):
+            user, token = CachedTokenAuthentication().authenticate_credentials(
+                self.key
+            )
+        self.assertEqual(user, self.user)
+
+    def test_logout_revokes_cached_token(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        cached = tokens.get(self.key)
+
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(tokens.get(self.key))
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+        # Запись, оставшаяся в кэше другого процесса, не принимается:
+        # версия токена изменилась.
+        tokens.set(self.key, cached)
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class RecipeUpdateTest(TestCase):
+    """
+    Изменение рецепта: сохраняются только изменившиеся поля, теги и строки
+    ингредиентов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.breakfast, cls.lunch, cls.dinner = create_tags(
+            'breakfast', 'lunch', 'dinner'
+        )
+        cls.eggs, cls.milk = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('яйца', 'молоко')
+        )
+        cls.recipe = create_recipe(
+            cls.author, 'Омлет', tags=[cls.breakfast, cls.lunch],
+            ingredients={cls.eggs: 3},
+        )
+        cls.url = f'/api/recipes/{cls.recipe.id}/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.recipe.refresh_from_db()
+        return get_updated_tables(queries)
+
+    def test_unchanged_recipe(self):
+        updated = self.patch({
+            'name': 'Омлет',
+            'cooking_time': 10,
+            'tags': [self.lunch.id, self.breakfast.id],
+            'ingredients': [{'id': self.eggs.id, 'amount': 3}],
+        })
+        self.assertEqual(updated, [])
+
+    def test_changed_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.patch({'name': 'Омлет', 'cooking_time': 15})
+        update, = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertIn('"cooking_time"', update)
+        self.assertNotIn('"name"', update)
+        self.assertEqual(self.recipe.cooking_time, 15)
+
+    def test_changed_ingredients(self):
+        updated = self.patch({'ingredients': [
+            {'id': self.eggs.id, 'amount': 3},
+            {'id': self.milk.id, 'amount': 200},
+        ]})
+        self.assertNotIn('recipes_recipe_tags', updated)
+        self.assertEqual(
+            dict(self.recipe.ingredient_recipe.values_list(
+                'ingredient_id', 'quantity'
+            )),
+            {self.eggs.id: 3, self.milk.id: 200}
+        )
+        self.assertEqual(self.recipe.ingredients_count, 2)
+
+    def test_changed_tags(self):
+        self.patch({'tags': [self.breakfast.id, self.dinner.id]})
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {self.breakfast.id, self.dinner.id}
+        )
+        self.assertEqual(
+            set(self.recipe.tag_ids), {self.breakfast.id, self.dinner.id}
+        )
+
+    def test_tags_diffed_against_links(self):
+        # Копия tag_ids разошлась с таблицей связей.
+        Recipe.objects.filter(id=self.recipe.id).update(
+            tag_ids=[self.breakfast.id, self.dinner.id]
+        )
+        self.patch({'tags': [self.breakfast.id, self.dinner.id]})
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            {self.breakfast.id, self.dinner.id}
+        )
+        self.assertEqual(
+            set(self.recipe.tag_ids), {self.breakfast.id, self.dinner.id}
+        )
+
+    def test_drifted_tag_ids_repaired(self):
+        Recipe.objects.filter(id=self.recipe.id).update(tag_ids=[])
+        self.patch({'tags': [self.breakfast.id, self.lunch.id]})
+        self.assertEqual(
+            set(self.recipe.tag_ids), {self.breakfast.id, self.lunch.id}
+        )
+
+
+class RecipeValidationTest(TestCase):
+    """
+    Проверка тегов и ингредиентов рецепта: все теги и все ингредиенты
+    запроса ищутся одним обращением к справочникам, поэтому число запросов
+    к базе данных при проверке не зависит от их количества.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tags = create_tags('breakfast', 'lunch', 'dinner')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(5)
+        ]
+        cls.image = get_image_data()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_data(self, name, tags, ingredients):
+        return {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': self.image,
+            'tags': tags,
+            'ingredients': [
+                {'id': id, 'amount': amount} for id, amount in ingredients
+            ],
+        }
+
+    def post(self, name, tags, ingredients):
+        return self.client.post(
+            '/api/recipes/', self.get_data(name, tags, ingredients),
+            format='json'
+        )
+
+    def test_create(self):
+        response = self.post(
+            'Омлет', [self.tags[0].id],
+            [(self.ingredients[0].id, 3), (self.ingredients[1].id, 200)]
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            [tag['id'] for tag in response.data['tags']], [self.tags[0].id]
+        )
+        self.assertEqual(
+            [(row['id'], row['amount'])
+             for row in response.data['ingredients']],
+            [(self.ingredients[0].id, 3), (self.ingredients[1].id, 200)]
+        )
+
+    def test_validation_queries(self):
+        counts = []
+        for size in (1, len(self.ingredients)):
+            serializer = RecipeSerializer(data=self.get_data(
+                'Омлет', [tag.id for tag in self.tags[:size]],
+                [(ingredient.id, 1) for ingredient in self.ingredients[:size]]
+            ))
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_tag(self):
+        response = self.post(
+            'Омлет', [self.tags[0].id, 999], [(self.ingredients[0].id, 1)]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999', str(response.data['tags']))
+
+    def test_invalid_tags(self):
+        for tags in ('breakfast', [], [True]):
+            with self.subTest(tags=tags):
+                response = self.post(
+                    'Омлет', tags, [(self.ingredients[0].id, 1)]
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('tags', response.data)
+
+    def test_unknown_ingredient(self):
+        response = self.post(
+            'Омлет', [self.tags[0].id],
+            [(self.ingredients[0].id, 1), (999, 1)]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['ingredients'],
+            ['Ингредиента с id 999 нет в базе данных.']
+        )
+
+    def test_duplicate_ingredient(self):
+        ingredient_id = self.ingredients[0].id
+        response = self.post(
+            'Омлет', [self.tags[0].id],
+            [(ingredient_id, 1), (ingredient_id, 2)]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(
+            f'id {ingredient_id}', str(response.data['ingredients'])
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+
+class UserRecipeListTest(TestCase):
+    """
+    Добавление рецепта в избранное и список покупок и удаление из них:
+    повторные запросы не изменяют список и счетчики повторно.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.eggs = Ingredient.objects.create(
+            name='яйца', measurement_unit='шт'
+        )
+        cls.recipe = create_recipe(
+            cls.user, 'Омлет', ingredients={cls.eggs: 3}
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_shopping_list(self):
+        return list(ShoppingListIngredient.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'amount'))
+
+    def test_favorite(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], self.recipe.id)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertTrue(self.user.favorite_recipes.filter(
+            id=self.recipe.id
+        ).exists())
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertFalse(self.user.favorite_recipes.exists())
+
+    def test_shopping_cart(self):
+        url = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.get_shopping_list(), [(self.eggs.id, 3)])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.shopping_count, 1)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(self.get_shopping_list(), [])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.shopping_count, 0)
+
+    def test_unknown_recipe(self):
+        for pk in (999, 'abc'):
+            with self.subTest(pk=pk):
+                url = f'/api/recipes/{pk}/favorite/'
+                response = self.client.post(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipe', response.data)
+                self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_anonymous(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        self.assertEqual(APIClient().post(url).status_code, 401)
+
+
+class UserRecipeListBatchTest(TestCase):
+    """
+    Добавление нескольких рецептов в избранное и список покупок и удаление
+    из них одним запросом.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.eggs = Ingredient.objects.create(
+            name='яйца', measurement_unit='шт'
+        )
+        cls.omelette, cls.scrambled_eggs = (
+            create_recipe(cls.user, name, ingredients={cls.eggs: quantity})
+            for name, quantity in (('Омлет', 3), ('Яичница', 2))
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def change(self, method, list_name, recipe_ids):
+        response = getattr(self.client, method)(
+            f'/api/recipes/{list_name}/', {'recipes': recipe_ids},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            (result['id'], result['status'])
+            for result in response.data['results']
+        ]
+
+    def test_shopping_cart(self):
+        ids = [self.omelette.id, self.scrambled_eggs.id]
+
+        self.assertEqual(
+            self.change('post', 'shopping_cart', [*ids, 999, ids[0]]),
+            [(ids[0], 'added'), (ids[1], 'added'), (999, 'not_found')]
+        )
+        self.assertEqual(
+            self.change('post', 'shopping_cart', ids),
+            [(ids[0], 'already_added'), (ids[1], 'already_added')]
+        )
+        self.assertEqual(
+            list(ShoppingListIngredient.objects.values_list(
+                'ingredient_id', 'amount'
+            )),
+            [(self.eggs.id, 5)]
+        )
+
+        self.assertEqual(
+            self.change('delete', 'shopping_cart', [ids[0]]),
+            [(ids[0], 'removed')]
+        )
+        self.assertEqual(
+            self.change('delete', 'shopping_cart', [ids[0], 999]),
+            [(ids[0], 'not_in_list'), (999, 'not_found')]
+        )
+        self.assertEqual(
+            list(ShoppingListIngredient.objects.values_list(
+                'ingredient_id', 'amount'
+            )),
+            [(self.eggs.id, 2)]
+        )
+
+    def test_favorite(self):
+        self.assertEqual(
+            self.change('post', 'favorite', [self.omelette.id]),
+            [(self.omelette.id, 'added')]
+        )
+        self.omelette.refresh_from_db()
+        self.assertEqual(self.omelette.favorites_count, 1)
+        self.assertEqual(
+            self.change('delete', 'favorite', [self.omelette.id]),
+            [(self.omelette.id, 'removed')]
+        )
+        self.omelette.refresh_from_db()
+        self.assertEqual(self.omelette.favorites_count, 0)
+
+    def test_invalid_payload(self):
+        for recipes in ([], list(range(1, 102)), [0], 'abc'):
+            with self.subTest(recipes=recipes):
+                response = self.client.post(
+                    '/api/recipes/favorite/', {'recipes': recipes},
+                    format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes', response.data)
+
+
+class RecipeTagsTest(TestCase):
+    """
+    Копия id тегов рецепта в поле tag_ids и фильтрация рецептов по тегам
+    пересечением массивов (tag_ids && ARRAY[...]).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.breakfast, cls.lunch, cls.dinner = create_tags(
+            'breakfast', 'lunch', 'dinner'
+        )
+        cls.omelette = create_recipe(cls.author, 'Омлет', [cls.breakfast])
+        cls.soup = create_recipe(cls.author, 'Суп', [cls.lunch])
+        cls.salad = create_recipe(
+            cls.author, 'Салат', [cls.breakfast, cls.lunch]
+        )
+        cls.steak = create_recipe(cls.author, 'Стейк', [cls.dinner])
+
+    def get_tag_ids(self, recipe):
+        recipe.refresh_from_db()
+        return set(recipe.tag_ids)
+
+    def test_filter(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get(
+                '/api/recipes/?tags=breakfast&tags=lunch'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(recipe['id'] for recipe in response.data['results']),
+            sorted([self.omelette.id, self.soup.id, self.salad.id])
+        )
+        recipes_query, = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "recipes_recipe"."id"')
+        ]
+        self.assertIn('"tag_ids" &&', recipes_query)
+        self.assertNotIn('DISTINCT', recipes_query)
+        self.assertNotIn('recipes_recipe_tags', recipes_query)
+
+    def test_unknown_tag(self):
+        response = APIClient().get('/api/recipes/?tags=unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_tag_ids_follow_links(self):
+        self.assertEqual(self.get_tag_ids(self.salad),
+                         {self.breakfast.id, self.lunch.id})
+
+        self.omelette.tags.add(self.dinner)
+        self.assertEqual(self.get_tag_ids(self.omelette),
+                         {self.breakfast.id, self.dinner.id})
+        self.omelette.tags.remove(self.breakfast)
+        self.assertEqual(self.get_tag_ids(self.omelette), {self.dinner.id})
+        self.omelette.tags.clear()
+        self.assertEqual(self.get_tag_ids(self.omelette), set())
+
+        self.lunch.recipes.add(self.steak)
+        self.assertEqual(self.get_tag_ids(self.steak),
+                         {self.lunch.id, self.dinner.id})
+        self.lunch.recipes.clear()
+        self.assertEqual(self.get_tag_ids(self.steak), {self.dinner.id})
+        self.assertEqual(self.get_tag_ids(self.salad), {self.breakfast.id})
+
+    def test_tag_deleted(self):
+        self.breakfast.delete()
+        self.assertEqual(self.get_tag_ids(self.salad), {self.lunch.id})
+        self.assertEqual(self.get_tag_ids(self.omelette), set())
+
+
+class CursorPaginationTest(TestCase):
+    """
+    Пагинация по ключу (pagination=cursor): страницы выбираются условием по
+    ключу сортировки без OFFSET и COUNT(*), ссылки next и previous проходят
+    весь список в обоих направлениях.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.authors = [create_user(f'author_{number}') for number in range(5)]
+        for author in cls.authors:
+            Subscribe.objects.create(user=cls.user, user_author=author)
+        cls.recipes = [
+            create_recipe(cls.authors[number % 5], f'Рецепт {number}')
+            for number in range(7)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        """
+        Проходит страницы по ссылкам next, затем обратно по ссылкам
+        previous. Возвращает id объектов страниц в прямом порядке.
+        """
+
+        pages = []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('count', response.data)
+                pages.append(
+                    [item['id'] for item in response.data['results']]
+                )
+                url = response.data['next']
+
+            url = response.data['previous']
+            for page in reversed(pages[:-1]):
+                response = self.client.get(url)
+                self.assertEqual(
+                    [item['id'] for item in response.data['results']], page
+                )
+                url = response.data['previous']
+            self.assertIsNone(url)
+
+        for query in queries:
+            self.assertNotIn('OFFSET', query['sql'])
+            self.assertNotIn('COUNT(', query['sql'])
+        self.assertTrue(all(len(page) <= 2 for page in pages))
+        return [id for page in pages for id in page]
+
+    def test_recipes(self):
+        self.assertEqual(
+            self.walk('/api/recipes/?pagination=cursor&limit=2'),
+            list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_subscriptions(self):
+        self.assertEqual(
+            self.walk('/api/users/subscriptions/?pagination=cursor&limit=2'),
+            [author.id for author in sorted(
+                self.authors, key=lambda author: author.username
+            )]
+        )
+
+    def test_popular_recipes(self):
+        # Одинаковые значения счетчика на границах страниц: позиция курсора
+        # включает id, поэтому рецепты не пропускаются и не повторяются.
+        for recipe, count in zip(self.recipes, (3, 1, 1, 1, 0, 0, 0)):
+            Recipe.objects.filter(id=recipe.id).update(favorites_count=count)
+
+        self.assertEqual(
+            self.walk(
+                '/api/recipes/?pagination=cursor&limit=2&ordering=popular'
+            ),
+            list(Recipe.objects.order_by('-favorites_count', '-id').
+                 values_list('id', flat=True))
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=invalid')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination(self):
+        response = self.client.get('/api/recipes/?limit=2&page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(self.recipes))
+        self.assertEqual(len(response.data['results']), 2)
+
+
+class MetricsTest(TestCase):
+    """
+    Адрес метрик доступен только с токеном METRICS_TOKEN, независимо от
+    адреса клиента.
+    """
+
+    url = '/api/metrics/'
+
+    def test_token_required(self):
+        client = APIClient()
+        with override_settings(METRICS_TOKEN=''):
+            response = client.get(
+                self.url, REMOTE_ADDR='127.0.0.1', HTTP_AUTHORIZATION='Bearer '
+            )
+            self.assertEqual(response.status_code, 404)
+        with override_settings(METRICS_TOKEN='secret'):
+            for authorization in ('', 'Bearer wrong', 'Token secret'):
+                with self.subTest(authorization=authorization):
+                    response = client.get(
+                        self.url, REMOTE_ADDR='127.0.0.1',
+                        HTTP_AUTHORIZATION=authorization
+                    )
+                    self.assertEqual(response.status_code, 404)
+            response = client.get(
+                self.url, REMOTE_ADDR='10.0.0.5',
+                HTTP_AUTHORIZATION='Bearer secret'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('text/plain', response['Content-Type'])
@@ -37,4 +37,5 @@ urlpatterns = [
         views.DelTokenView.as_view(),
         name='token_logout'
     ),
+    path('metrics/', views.metrics, name='metrics'),
 ]
@@ -0,0 +1,74 @@
+"""
+Счетчики версий данных. Счетчик увеличивается при каждом изменении
+соответствующих данных и хранится в кэше Django, общем для всех процессов
+(при настройке разделяемого бэкенда кэша), поэтому по нему можно без
+обращения к базе данных проверить, изменились ли данные.
+"""
+
+import time
+from typing import List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'version'
+
+
+def _get_key(name: Tuple) -> str:
+    return ':'.join(str(part) for part in (KEY_PREFIX, *name))
+
+
+def _get_initial_version() -> int:
+    # Начальное значение зависит от времени создания счетчика, чтобы после
+    # очистки кэша счетчик не повторил уже выданные значения.
+    return time.time_ns()
+
+
+def is_shared() -> bool:
+    """
+    Возвращает True, если счетчики хранятся в общем для процессов кэше
+    (настройка VERSIONS_SHARED) и изменения, сделанные в любом процессе,
+    видны во всех процессах.
+    """
+
+    return getattr(settings, 'VERSIONS_SHARED', False)
+
+
+def get_versions(*names: Tuple) -> List[int]:
+    """
+    Возвращает текущие значения счетчиков версий с именами names. Имя
+    счетчика - кортеж, например ('recipe', 1). Отсутствующие счетчики
+    создаются.
+    """
+
+    keys = [_get_key(name) for name in names]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _get_initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def _bump(names: Tuple[Tuple, ...]) -> None:
+    for name in names:
+        key = _get_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _get_initial_version(), timeout=None)
+
+
+def bump(*names: Tuple) -> None:
+    """
+    Увеличивает счетчики версий с именами names. Внутри транзакции счетчики
+    увеличиваются повторно после ее фиксации: другие процессы могли
+    прочитать данные до фиксации, уже получив новую версию.
+    """
+
+    _bump(names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(names))
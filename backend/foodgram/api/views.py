@@ -1,12 +1,15 @@
-from django.db.models import Exists, OuterRef, Sum
-from django.http import FileResponse
-from django.shortcuts import get_object_or_404
+import hmac
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import FileResponse, Http404, HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
 from rest_framework.mixins import (CreateModelMixin, ListModelMixin,
                                    RetrieveModelMixin)
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -18,22 +21,42 @@ from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
 from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
 from users.models import Subscribe, User
 
-from . import services
+from . import services, versions
 from .filters import RecipeFilter
-from .mixins import CustomCreateDeleteMixin
-from .pagination import CustomPageNumberPagination
+from .metrics import registry
+from .mixins import (ConditionalGetMixin, CursorPaginationMixin,
+                     CustomCreateDeleteMixin, UserRecipeListMixin)
+from .pagination import (CustomPageNumberPagination,
+                         PopularRecipesCursorPagination,
+                         SubscriptionsCursorPagination)
 from .permissions import IsOwnerOrReadOnly
-from .serializers import (FavoriteShoppingSerializer, GetTokenSerializer,
-                          IngredientSerielizer, ListSubscriptionsSerializer,
-                          RecipeSerializer, SubscribeSerializer, TagSerielizer,
-                          UserChangePasswordSerializer, UserSerializer)
+from .serializers import (GetTokenSerializer, IngredientSerielizer,
+                          ListSubscriptionsSerializer, RecipeIdsSerializer,
+                          RecipeSerializer, SubscribeSerializer,
+                          TagSerielizer, UserChangePasswordSerializer,
+                          UserSerializer)
 
 
-class UserViewSet(CreateModelMixin, ListModelMixin, RetrieveModelMixin,
-                  GenericViewSet):
+def get_reference_object(view, reference_data):
+    """
+    Возвращает объект справочника, кэшируемого в памяти процесса, по id из
+    URL или вызывает исключение Http404.
+    """
+
+    pk = view.kwargs[view.lookup_url_kwarg or view.lookup_field]
+    obj = reference_data.get(int(pk)) if str(pk).isdigit() else None
+    if obj is None:
+        raise Http404
+    view.check_object_permissions(view.request, obj)
+    return obj
+
+
+class UserViewSet(CursorPaginationMixin, CreateModelMixin, ListModelMixin,
+                  RetrieveModelMixin, GenericViewSet):
     """
     Вьюсет для работы с пользователями.
     URL - /users/.
+    Для списка подписок доступна пагинация по ключу (pagination=cursor).
     """
 
     name = 'Обработка запросов о пользователях'
@@ -51,6 +74,11 @@ class UserViewSet(CreateModelMixin, ListModelMixin, RetrieveModelMixin,
             permission_classes = (IsAuthenticated,)
         return [permission() for permission in permission_classes]
 
+    def get_cursor_pagination_class(self):
+        if self.action == 'subscriptions':
+            return SubscriptionsCursorPagination
+        return None
+
     def get_serializer_class(self):
         if self.action == 'set_password':
             return UserChangePasswordSerializer
@@ -65,6 +93,41 @@ class UserViewSet(CreateModelMixin, ListModelMixin, RetrieveModelMixin,
             return User.objects.annotate(is_subscribed=Exists(subscriptions))
         return User.objects.all()
 
+    def get_subscriptions_queryset(self):
+        """
+        Авторы, на которых подписан текущий пользователь, с рецептами.
+        Страница формируется за фиксированное число запросов: число рецептов
+        автора хранится в поле recipes_count, рецепты авторов страницы (не
+        более recipes_limit на автора) загружаются одним запросом.
+        """
+
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_card', 'image_thumbnail',
+            'cooking_time', 'author_id'
+        )
+        limit = self.request.query_params.get('recipes_limit', '')
+        if limit.isdigit():
+            # Первые recipes_limit рецептов каждого автора выбираются
+            # коррелированным подзапросом с LIMIT: Django 3.2 не позволяет
+            # фильтровать по оконной функции ROW_NUMBER().
+            recipes = recipes.filter(
+                id__in=Subquery(
+                    Recipe.objects.filter(author=OuterRef('author')).
+                    order_by('-pub_date', '-id').
+                    values('id')[:int(limit)]
+                )
+            )
+
+        return self.request.user.subscribing.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=recipes.order_by('-pub_date', '-id'),
+                to_attr='limited_recipes'
+            )
+        ).order_by('username', 'id')
+
     @action(
         methods=['POST', ],
         url_path='set_password',
@@ -123,21 +186,17 @@ class UserViewSet(CreateModelMixin, ListModelMixin, RetrieveModelMixin,
         URL - /users/subscriptions/.
         """
 
-        user = request.user
-        queryset = user.subscribing.annotate(
-            is_subscribed=Exists(
-                Subscribe.objects.filter(user=user, user_author=OuterRef('pk'))
-            )
-        ).prefetch_related('recipes').all()
+        queryset = self.get_subscriptions_queryset()
 
         page = self.paginate_queryset(queryset)
 
-        if page:
+        if page is not None:
             serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(queryset, many=True)
 
-        return self.get_paginated_response(serializer.data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 class SubscribeViewSet(CustomCreateDeleteMixin):
@@ -189,10 +248,9 @@ class GetTokenView(ObtainAuthToken):
         """
         serializer = GetTokenSerializer(data=request.data)
         if serializer.is_valid():
-            user = get_object_or_404(
-                User, email=serializer.validated_data['email']
+            token, created = Token.objects.get_or_create(
+                user=serializer.validated_data['user']
             )
-            token, created = Token.objects.get_or_create(user=user)
             return Response(
                 {
                     'auth_token': token.key
@@ -227,9 +285,10 @@ class DelTokenView(APIView):
         )
 
 
-class TagViewset(ReadOnlyModelViewSet):
+class TagViewset(ConditionalGetMixin, ReadOnlyModelViewSet):
     """
     Вьюсет для получения списка тегов и отдельного тега.
+    Поддерживаются условные запросы (ETag/If-None-Match).
     URL = /tags/.
     """
 
@@ -241,12 +300,35 @@ class TagViewset(ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     pagination_class = None
 
+    def get_etag_parts(self, request, *args, **kwargs):
+        return versions.get_versions(('tag',)), kwargs
+
+    def get_object(self):
+        return get_reference_object(self, services.tag_reference)
+
+    def list(self, request):
+        """
+        Метод для обработки GET запроса на получение списка тегов. Теги
+        выдаются из справочника в памяти процесса.
+        """
+
+        response = self.handle_conditional_get(request)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(
+            services.tag_reference.all(), many=True
+        )
 
-class IngredientViewset(ReadOnlyModelViewSet):
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class IngredientViewset(ConditionalGetMixin, ReadOnlyModelViewSet):
     """
     Вьюсет для получения списка ингредиентов и отдельного ингредиента.
     Возможен поиск ингредиентов по имени (параметр name в строке запроса).
-    URL = /tags/.
+    Поддерживаются условные запросы (ETag/If-None-Match).
+    URL = /ingredients/.
     """
 
     name = 'Обработка запросов об ингридиентах'
@@ -256,14 +338,47 @@ class IngredientViewset(ReadOnlyModelViewSet):
     serializer_class = IngredientSerielizer
     queryset = Ingredient.objects.all()
     pagination_class = None
-    filter_backends = (SearchFilter, )
-    search_fields = ('name', )
 
+    def get_etag_parts(self, request, *args, **kwargs):
+        return (
+            versions.get_versions(('ingredient',)),
+            kwargs,
+            sorted(request.query_params.lists()),
+        )
+
+    def get_object(self):
+        return get_reference_object(self, services.ingredient_reference)
+
+    def list(self, request):
+        """
+        Метод для обработки GET запроса на получение списка ингредиентов.
+        Ответ формируется по индексу ингредиентов в памяти: сначала
+        ингредиенты, имя которых начинается с name, затем содержащие name.
+        Параметр limit ограничивает число результатов.
+        """
+
+        response = self.handle_conditional_get(request)
+        if response is not None:
+            return response
+
+        limit = request.query_params.get('limit')
+        ingredients = services.search_ingredients(
+            request.query_params.get('name', ''),
+            int(limit) if limit and limit.isdigit() else None
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-class RecipeViewset(ModelViewSet):
+
+class RecipeViewset(ConditionalGetMixin, CursorPaginationMixin,
+                    ModelViewSet):
     """
     Вьюсет для работы с запросами о рецептах - просмотр списка рецептов,
     просмотр отдельного рецепта, создание, изменение и удаление рецепта.
+    Для списка рецептов доступна пагинация по ключу (pagination=cursor).
+    Для отдельного рецепта поддерживаются условные запросы
+    (ETag/If-None-Match).
     URL - /recipes/.
     """
 
@@ -273,6 +388,8 @@ class RecipeViewset(ModelViewSet):
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
+    conditional_actions = ('retrieve',)
+    etag_vary_headers = ('Authorization',)
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
@@ -283,20 +400,132 @@ class RecipeViewset(ModelViewSet):
             permission_classes = (IsAuthenticated,)
         return [permission() for permission in permission_classes]
 
+    def get_cursor_pagination_class(self):
+        if self.request.query_params.get('ordering') == 'popular':
+            return PopularRecipesCursorPagination
+        return super().get_cursor_pagination_class()
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        """
+        Представление рецепта зависит от самого рецепта, справочников тегов
+        и ингредиентов, данных автора, а для авторизованного пользователя -
+        еще и от его списков избранного, покупок и подписок. Автор рецепта
+        получается одним запросом по первичному ключу; для несуществующего
+        рецепта ETag не вычисляется.
+        """
+
+        pk = kwargs['pk']
+        if not str(pk).isdigit():
+            return None
+        author_id = Recipe.objects.filter(pk=pk).values_list(
+            'author_id', flat=True
+        ).first()
+        if author_id is None:
+            return None
+
+        names = [('recipe', int(pk)), ('tag',), ('ingredient',),
+                 ('user', author_id)]
+        user = request.user
+        if user.is_authenticated:
+            names.append(('user-lists', user.id))
+        return user.id, versions.get_versions(*names)
+
     def get_queryset(self):
+        """
+        Список и отдельный рецепт получаются за фиксированное число запросов
+        вне зависимости от размера страницы: автор подтягивается через JOIN,
+        теги и ингредиенты - через Prefetch, признаки избранного, списка
+        покупок и подписки на автора вычисляются аннотациями.
+        """
+
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredient_recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ),
+        )
+
         user = self.request.user
         if user.is_authenticated:
             favorite = user.favorite_recipes.filter(id=OuterRef('id'))
             shopping_list = user.shopping_recipes.filter(id=OuterRef('id'))
-            return Recipe.objects.annotate(
+            subscription = Subscribe.objects.filter(
+                user=user, user_author=OuterRef('author')
+            )
+            return queryset.annotate(
                 is_favorited=Exists(favorite),
-                is_in_shopping_cart=Exists(shopping_list)
+                is_in_shopping_cart=Exists(shopping_list),
+                author_is_subscribed=Exists(subscription),
             )
-        return Recipe.objects.all()
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        services.update_recipe_in_shopping_lists(
+            instance,
+            services.get_ingredients_delta(
+                services.get_recipe_ingredients(instance), {}
+            )
+        )
+        instance.delete()
+
+    def change_user_list(self, request, list_name):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = services.change_user_list(
+            request.user,
+            list_name,
+            serializer.validated_data['recipes'],
+            add=request.method == 'POST'
+        )
+
+        return Response(
+            {
+                'results': [
+                    {'id': id, 'status': result}
+                    for id, result in results.items()
+                ]
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @action(
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart',
+        detail=False,
+    )
+    def shopping_cart(self, request):
+        """
+        Метод для добавления нескольких рецептов в список покупок (POST) и
+        удаления из него (DELETE) одним запросом. В теле запроса передается
+        список id рецептов: {"recipes": [1, 2, 3]}. Изменения выполняются в
+        одной транзакции, в ответе - результат для каждого id.
+        URL = recipes/shopping_cart/.
+        """
+
+        return self.change_user_list(request, 'shopping')
+
+    @action(
+        methods=['POST', 'DELETE'],
+        url_path='favorite',
+        detail=False,
+    )
+    def favorite(self, request):
+        """
+        Метод для добавления нескольких рецептов в избранное (POST) и
+        удаления из него (DELETE) одним запросом, аналогично shopping_cart.
+        URL = recipes/favorite/.
+        """
+
+        return self.change_user_list(request, 'favorite')
+
     @action(
         methods=['GET', ],
         url_path='download_shopping_cart',
@@ -308,33 +537,15 @@ class RecipeViewset(ModelViewSet):
         URL = recipes/download_shopping_cart/.
         """
 
-        user = request.user
-        ingredient_list_user = (
-            IngredientInRecipe.objects.
-            prefetch_related('ingredient', 'recipe').
-            filter(recipe__shoppings=user).
-            values('ingredient__id').
-            order_by('ingredient__id')
-        )
-
-        shopping_list = (
-            ingredient_list_user.annotate(amount=Sum('quantity')).
-            values_list(
-                'ingredient__name', 'ingredient__measurement_unit', 'amount'
-            )
-        )
-
-        file = services.create_pdf(shopping_list, 'Список покупок')
-
         return FileResponse(
-            file,
+            services.get_shopping_list_document(request.user),
             as_attachment=True,
             filename='shopping_list.pdf',
             status=status.HTTP_200_OK
         )
 
 
-class FavouriteViewSet(CustomCreateDeleteMixin):
+class FavouriteViewSet(UserRecipeListMixin):
     """
     Вьюсет для работы с запросами об избранном - добавление в избранное и
     удаление рецепта из избранного по id.
@@ -345,27 +556,12 @@ class FavouriteViewSet(CustomCreateDeleteMixin):
     description = 'Обработка запросов на добавление/удаление в избранное'
 
     permission_classes = (IsAuthenticated,)
-    model_class = Recipe
+    list_name = 'favorite'
+    list_title = 'список избранного'
     error = 'Указанный рецепт не был добавлен в список избранного.'
 
-    def get_queryset(self):
-        user = self.request.user
-        return user.favorite_recipes
-
-    def get_serializer(self, id):
-        return FavoriteShoppingSerializer(
-            data={
-                'recipe': id,
-                'user': self.request.user.id,
-                'type_list': 'favorite',
-            },
-            context={
-                'request': self.request,
-            }
-        )
 
-
-class ShoppingListViewSet(CustomCreateDeleteMixin):
+class ShoppingListViewSet(UserRecipeListMixin):
     """
     Вьюсет для работы с запросами о списке покупок - добавление в список и
     удаление рецепта из списка по id.
@@ -376,21 +572,25 @@ class ShoppingListViewSet(CustomCreateDeleteMixin):
     description = 'Обработка запросов на добавление/удаление в список покупок'
 
     permission_classes = (IsAuthenticated,)
-    model_class = Recipe
+    list_name = 'shopping'
+    list_title = 'список покупок'
     error = 'Указанный рецепт не был добавлен в список покупок.'
 
-    def get_queryset(self):
-        user = self.request.user
-        return user.shopping_recipes
 
-    def get_serializer(self, id):
-        return FavoriteShoppingSerializer(
-            data={
-                'recipe': id,
-                'user': self.request.user.id,
-                'type_list': 'shopping',
-            },
-            context={
-                'request': self.request,
-            }
-        )
+def metrics(request):
+    """
+    Метрики обработки запросов этого процесса в текстовом формате
+    Prometheus. Доступны только с заголовком
+    "Authorization: Bearer <METRICS_TOKEN>"; без METRICS_TOKEN не
+    доступны. URL - /metrics/.
+    """
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token or not hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(),
+        f'Bearer {token}'.encode(),
+    ):
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
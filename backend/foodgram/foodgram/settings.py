@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,6 +102,51 @@ DATABASES = {
 # }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# В кэше хранятся счетчики версий данных, по которым вычисляются ETag и
+# проверяется актуальность справочников в памяти процессов. При
+# запуске нескольких процессов (воркеров gunicorn) необходим общий для них
+# бэкенд, например django.core.cache.backends.memcached.PyMemcacheCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+# Общие ли счетчики версий для всех процессов. По умолчанию счетчики в
+# кэше в памяти процесса (LocMemCache, DummyCache) считаются не общими:
+# ETag и ответы 304 тогда отключаются, так как процесс, не увидевший
+# изменения, ответил бы 304 на измененный ресурс. При запуске одного
+# процесса (например, runserver) можно задать VERSIONS_SHARED=true.
+VERSIONS_SHARED = os.getenv(
+    'VERSIONS_SHARED',
+    default=str(not CACHES['default']['BACKEND'].endswith(
+        ('LocMemCache', 'DummyCache')
+    ))
+).lower() in ('true', '1', 'yes')
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.2/topics/auth/passwords/
+# Новые пароли хэшируются первым хэшером списка. Хэши, полученные другими
+# хэшерами списка или с устаревшим числом итераций, пересчитываются при
+# успешном входе пользователя. Стоимость проверки пароля выбранным хэшером
+# можно измерить командой bench_password_hashers.
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -143,6 +189,68 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Максимальное время (в секундах) жизни справочников (тегов, ингредиентов)
+# в памяти процесса, после которого они загружаются из базы данных заново,
+# даже если счетчик версии не изменился: с бэкендом кэша, не общим для
+# процессов, изменения из других процессов не увеличивают счетчик.
+REFERENCE_DATA_TTL = int(os.getenv('REFERENCE_DATA_TTL', default=300))
+
+# Ограничения для загружаемых изображений рецептов: размер файла в байтах
+# и размеры изображения в пикселях.
+IMAGE_MAX_UPLOAD_SIZE = int(
+    os.getenv('IMAGE_MAX_UPLOAD_SIZE', default=10 * 1024 * 1024)
+)
+IMAGE_MAX_DIMENSIONS = (8000, 8000)
+
+# Загруженные изображения перекодируются в IMAGE_FORMAT; для каждого
+# изображения формируются варианты с размерами не более указанных
+# (поле модели рецепта: (ширина, высота)).
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 85
+IMAGE_VARIANTS = {
+    'image': (1280, 1280),
+    'image_card': (600, 600),
+    'image_thumbnail': (160, 160),
+}
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=os.cpu_count()))
+
+# Максимальный суммарный размер (в байтах) сформированных документов со
+# списками покупок, хранимых в памяти процесса.
+SHOPPING_LIST_CACHE_SIZE = int(
+    os.getenv('SHOPPING_LIST_CACHE_SIZE', default=64 * 1024 * 1024)
+)
+# Максимальный размер (в байтах) документа, сохраняемого в кэше; документы
+# большего размера отдаются из временного файла без кэширования.
+SHOPPING_LIST_CACHE_MAX_DOCUMENT_SIZE = int(
+    os.getenv('SHOPPING_LIST_CACHE_MAX_DOCUMENT_SIZE', default=40 * 1024)
+)
+
+# Кэш токенов аутентификации в памяти процесса: максимальное число токенов
+# и время (в секундах), в течение которого токен не перепроверяется по базе
+# данных. Если счетчики версий не общие (VERSIONS_SHARED), отозванный токен
+# принимается другими процессами до истечения этого времени.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', default=10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default=60))
+
+# Метрики обработки запросов (api.middleware.MetricsMiddleware), доступные по
+# адресу /api/metrics/ с заголовком "Authorization: Bearer <METRICS_TOKEN>"
+# (запросы проходят через nginx, поэтому адрес клиента не проверяется). Без
+# METRICS_TOKEN адрес метрик недоступен. Запросы,
+# выполнившие больше METRICS_QUERY_BUDGET SQL-запросов или обрабатывавшиеся
+# дольше METRICS_LATENCY_BUDGET секунд, записываются в журнал api.middleware.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='true').lower() in (
+    'true', '1', 'yes'
+)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+METRICS_QUERY_BUDGET = int(os.getenv('METRICS_QUERY_BUDGET', default=20))
+METRICS_LATENCY_BUDGET = float(
+    os.getenv('METRICS_LATENCY_BUDGET', default=0.5)
+)
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -152,7 +260,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
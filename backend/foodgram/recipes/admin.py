@@ -1,5 +1,8 @@
 from django.contrib import admin
 
+from api import services
+from users.models import User
+
 from .models import Ingredient, IngredientInRecipe, Recipe, Tag
 
 
@@ -56,6 +59,20 @@ class RecipeAdmin(admin.ModelAdmin):
     ]
     autocomplete_fields = ('author', 'tags',)
 
+    def save_related(self, request, form, formsets, change):
+        """
+        Ингредиенты рецепта изменяются в форме без обновления счетчиков,
+        поэтому счетчики рецепта и его авторов (прежнего и нового)
+        пересчитываются после сохранения.
+        """
+
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        services.repair_counters(Recipe, [recipe.id])
+        services.repair_counters(
+            User, {form.initial.get('author'), recipe.author_id} - {None}
+        )
+
 
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
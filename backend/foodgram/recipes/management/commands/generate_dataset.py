@@ -0,0 +1,373 @@
+"""
+Команда для генерации большого синтетического набора данных для
+нагрузочного тестирования: пользователей, рецептов с ингредиентами и
+тегами, подписок, избранного и списков покупок.
+
+Ингредиенты загружаются из data/ingredients.csv (командой
+load_ingridients). Популярность авторов, рецептов и ингредиентов
+распределена по закону Ципфа: небольшая часть авторов пишет большую часть
+рецептов и собирает большую часть подписчиков, небольшая часть рецептов
+чаще всего добавляется в избранное и списки покупок. При одинаковых
+параметрах и --seed генерируются одинаковые данные.
+
+Записи добавляются пакетами через bulk_create, поэтому сигналы моделей не
+отправляются: сводные списки покупок и счетчики рецептов и пользователей
+пересчитываются явно. Версии данных в общем кэше не увеличиваются:
+создаются только новые пользователи и рецепты.
+"""
+
+import itertools
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api import services
+from users.models import Subscribe
+
+from ...models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+User = get_user_model()
+
+INGREDIENTS_FILE = (
+    settings.BASE_DIR.parent.parent / 'data' / 'ingredients.csv'
+)
+
+TAGS = (
+    ('Завтрак', '#e26c2d', 'breakfast'),
+    ('Обед', '#49b64e', 'lunch'),
+    ('Ужин', '#8775d2', 'dinner'),
+)
+
+
+class ZipfSampler:
+    """
+    Выбор элементов population с вероятностью, обратно пропорциональной
+    степени skew их номера: первый элемент - самый популярный.
+    """
+
+    def __init__(self, population, skew, rng):
+        self.population = list(population)
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** skew for rank in range(1, len(self.population) + 1)
+        ))
+        self.rng = rng
+
+    def choices(self, count):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=count
+        )
+
+    def distinct(self, count, exclude=None):
+        """
+        Возвращает множество из count различных элементов, не считая
+        exclude (или все элементы, если их меньше).
+        """
+
+        count = min(count, len(self.population) - (exclude is not None))
+        result = set()
+        while len(result) < count:
+            result.update(self.choices(count - len(result)))
+            result.discard(exclude)
+        return result
+
+
+class Command(BaseCommand):
+
+    help = 'Генерация синтетического набора данных для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Число пользователей',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=5000,
+            help='Число рецептов',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            nargs=2,
+            default=[3, 15],
+            metavar=('MIN', 'MAX'),
+            help='Минимальное и максимальное число ингредиентов в рецепте',
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Среднее число рецептов в избранном пользователя',
+        )
+        parser.add_argument(
+            '--shopping',
+            type=int,
+            default=5,
+            help='Среднее число рецептов в списке покупок пользователя',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель распределения Ципфа для популярности',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='gen',
+            help='Префикс имен пользователей и названий рецептов',
+        )
+        parser.add_argument(
+            '--password',
+            default='generated-password',
+            help='Пароль всех сгенерированных пользователей',
+        )
+        parser.add_argument(
+            '--ingredients-file',
+            default=str(INGREDIENTS_FILE),
+            help='Файл с ингредиентами для команды load_ingridients',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Число записей, добавляемых за один запрос',
+        )
+
+    def handle(self, *args, **options):
+
+        min_ingredients, max_ingredients = options['ingredients']
+        if not 0 < min_ingredients <= max_ingredients:
+            raise CommandError('Неверный диапазон числа ингредиентов.')
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужны хотя бы два пользователя и рецепт.')
+        self.prefix = options['prefix']
+        if User.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix} уже существуют.'
+            )
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.started = time.monotonic()
+        self.stats = {}
+
+        ingredient_ids = self.load_ingredients(options['ingredients_file'])
+        tag_ids = self.load_tags()
+        user_ids = self.create_users(options['users'], options['password'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, tag_ids, ingredient_ids,
+            min_ingredients, max_ingredients, options['skew']
+        )
+        self.create_user_lists(
+            user_ids, recipe_ids, options['subscriptions'],
+            options['favorites'], options['shopping'], options['skew']
+        )
+        self.repair_counters(Recipe, recipe_ids)
+        self.repair_counters(User, user_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Successfully generated: ' + ', '.join(
+                f'{count} {name}' for name, count in self.stats.items()
+            )
+        ))
+
+    def report(self, name, count):
+        self.stats[name] = self.stats.get(name, 0) + count
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{self.stats[name]} {name} generated, {elapsed:.0f} s'
+        )
+
+    def load_ingredients(self, file_path):
+        try:
+            call_command('load_ingridients', file_path, stdout=self.stdout)
+        except CommandError:
+            if not Ingredient.objects.exists():
+                raise
+        # Порядок ингредиентов перемешивается, чтобы популярными
+        # оказались не только первые по алфавиту.
+        ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.rng.shuffle(ingredient_ids)
+        return ingredient_ids
+
+    def load_tags(self):
+        if not Tag.objects.exists():
+            for name, color, slug in TAGS:
+                Tag.objects.create(name=name, color=color, slug=slug)
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def get_ids(self, model, field, values):
+        return list(
+            model.objects.filter(**{f'{field}__in': values}).
+            order_by('id').values_list('id', flat=True)
+        )
+
+    def create_users(self, count, password):
+        # Хэширование пароля медленное, поэтому хэш вычисляется один раз.
+        password = make_password(password)
+        user_ids = []
+        for start in range(0, count, self.batch_size):
+            users = [
+                User(
+                    username=f'{self.prefix}_{number}',
+                    email=f'{self.prefix}_{number}@example.com',
+                    first_name=f'Имя {number}',
+                    last_name=f'Фамилия {number}',
+                    password=password,
+                )
+                for number in range(start, min(start + self.batch_size, count))
+            ]
+            User.objects.bulk_create(users)
+            user_ids.extend(self.get_ids(
+                User, 'username', [user.username for user in users]
+            ))
+            self.report('users', len(users))
+        return user_ids
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredient_ids,
+                       min_ingredients, max_ingredients, skew):
+        authors = ZipfSampler(
+            self.rng.sample(user_ids, len(user_ids)), skew, self.rng
+        )
+        ingredients = ZipfSampler(ingredient_ids, skew, self.rng)
+        recipe_ids = []
+
+        for start in range(0, count, self.batch_size):
+            numbers = range(start, min(start + self.batch_size, count))
+            recipes = [
+                Recipe(
+                    name=f'{self.prefix} recipe {number}',
+                    text=f'Описание рецепта {number}',
+                    cooking_time=self.rng.randint(1, 180),
+                    author_id=author_id,
+                    image='images/generated.png',
+                    tag_ids=sorted(self.rng.sample(
+                        tag_ids, self.rng.randint(1, len(tag_ids))
+                    )),
+                )
+                for number, author_id in zip(
+                    numbers, authors.choices(len(numbers))
+                )
+            ]
+            with transaction.atomic():
+                Recipe.objects.bulk_create(recipes)
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    ids = self.get_ids(
+                        Recipe, 'name', [recipe.name for recipe in recipes]
+                    )
+                    for recipe, id in zip(recipes, ids):
+                        recipe.id = id
+
+                Recipe.tags.through.objects.bulk_create(
+                    [
+                        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                        for recipe in recipes
+                        for tag_id in recipe.tag_ids
+                    ],
+                    batch_size=self.batch_size
+                )
+                rows = [
+                    IngredientInRecipe(
+                        recipe_id=recipe.id,
+                        ingredient_id=ingredient_id,
+                        quantity=self.rng.randint(1, 500)
+                    )
+                    for recipe in recipes
+                    for ingredient_id in ingredients.distinct(
+                        self.rng.randint(min_ingredients, max_ingredients)
+                    )
+                ]
+                IngredientInRecipe.objects.bulk_create(
+                    rows, batch_size=self.batch_size
+                )
+
+            recipe_ids.extend(recipe.id for recipe in recipes)
+            self.stats['recipe ingredients'] = (
+                self.stats.get('recipe ingredients', 0) + len(rows)
+            )
+            self.report('recipes', len(recipes))
+        return recipe_ids
+
+    def repair_counters(self, model, ids):
+        for start in range(0, len(ids), self.batch_size):
+            services.repair_counters(model, ids[start:start + self.batch_size])
+        self.stdout.write(f'{model._meta.model_name} counters updated')
+
+    def create_user_lists(self, user_ids, recipe_ids, subscriptions,
+                          favorites, shopping, skew):
+        authors = ZipfSampler(
+            self.rng.sample(user_ids, len(user_ids)), skew, self.rng
+        )
+        recipes = ZipfSampler(
+            self.rng.sample(recipe_ids, len(recipe_ids)), skew, self.rng
+        )
+        favorite_model = User.favorite_recipes.through
+        shopping_model = User.shopping_recipes.through
+
+        # Пользователи обрабатываются группами так, чтобы в одной группе
+        # было порядка batch_size записей.
+        users_per_batch = max(
+            self.batch_size // max(subscriptions + favorites + shopping, 1),
+            1
+        )
+        for start in range(0, len(user_ids), users_per_batch):
+            batch = user_ids[start:start + users_per_batch]
+            rows = {'subscriptions': [], 'favorites': [], 'shopping': []}
+            for user_id in batch:
+                rows['subscriptions'].extend(
+                    Subscribe(user_id=user_id, user_author_id=author_id)
+                    for author_id in authors.distinct(
+                        self.rng.randint(0, 2 * subscriptions),
+                        exclude=user_id
+                    )
+                )
+                rows['favorites'].extend(
+                    favorite_model(user_id=user_id, recipe_id=recipe_id)
+                    for recipe_id in recipes.distinct(
+                        self.rng.randint(0, 2 * favorites)
+                    )
+                )
+                rows['shopping'].extend(
+                    shopping_model(user_id=user_id, recipe_id=recipe_id)
+                    for recipe_id in recipes.distinct(
+                        self.rng.randint(0, 2 * shopping)
+                    )
+                )
+
+            with transaction.atomic():
+                for name, objects in rows.items():
+                    if objects:
+                        type(objects[0]).objects.bulk_create(
+                            objects, batch_size=self.batch_size
+                        )
+                services.rebuild_shopping_lists(batch)
+
+            for name, objects in rows.items():
+                self.stats[name] = self.stats.get(name, 0) + len(objects)
+            self.report('user lists', len(batch))
@@ -0,0 +1,291 @@
+"""
+Команда для массовой загрузки рецептов из файла в формате NDJSON (одна
+JSON-запись на строку). Путь к файлу задается как аргумент команды, '-' -
+чтение из стандартного ввода.
+
+Формат записи:
+{"name": "Омлет", "text": "...", "cooking_time": 10,
+ "author": "chef@example.com", "image": "images/omelette.jpg",
+ "tags": ["breakfast"],
+ "ingredients": [{"name": "яйца", "measurement_unit": "шт", "amount": 3}]}
+
+Автор указывается адресом e-mail существующего пользователя, изображение -
+путем к уже загруженному в MEDIA_ROOT файлу, теги - слагами, ингредиенты -
+id или парой name/measurement_unit из справочника ингредиентов.
+"""
+
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api import services
+
+from ...models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+User = get_user_model()
+
+# Максимальное число строк в одном INSERT, чтобы не превысить ограничение
+# PostgreSQL на число параметров запроса.
+BULK_BATCH_SIZE = 5000
+
+# Максимальное значение полей PositiveSmallIntegerField (время
+# приготовления, количество ингредиента).
+MAX_SMALL_INTEGER = 32767
+
+
+class RecordError(Exception):
+    pass
+
+
+def is_integer(value):
+    # bool - подкласс int, но значения true/false не принимаются.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_small_integer(value):
+    return is_integer(value) and 1 <= value <= MAX_SMALL_INTEGER
+
+
+class Command(BaseCommand):
+
+    help = 'Массовая загрузка рецептов из файла в формате NDJSON'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            'file_path',
+            type=str,
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Число рецептов, загружаемых в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+
+        self.verbosity = options['verbosity']
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): id
+            for id, name, measurement_unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.ingredient_ids = set(self.ingredients.values())
+        self.authors = {}
+        self.stats = {'imported': 0, 'skipped': 0, 'malformed': 0}
+        self.started = time.monotonic()
+
+        if options['file_path'] == '-':
+            self.import_file(sys.stdin, options['batch_size'])
+        else:
+            try:
+                with open(options['file_path'], encoding='utf-8') as file:
+                    self.import_file(file, options['batch_size'])
+            except OSError as error:
+                raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Successfully loaded: {imported} imported, {skipped} skipped, '
+            '{malformed} malformed'.format(**self.stats)
+        ))
+
+    def import_file(self, file, batch_size):
+        batch = []
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                self.validate_record(record)
+            except ValueError as error:
+                self.report_error(line_number, error)
+                self.stats['malformed'] += 1
+                continue
+            batch.append((line_number, record))
+            if len(batch) >= batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+
+    def validate_record(self, record):
+        """
+        Проверяет типы и диапазоны значений полей записи, чтобы
+        некорректная запись не прервала загрузку всего пакета ошибкой базы
+        данных. Наличие автора, тегов и ингредиентов проверяется позже.
+        """
+
+        if not isinstance(record, dict):
+            raise ValueError('record is not an object')
+
+        name = record.get('name')
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError('name must be a non-empty string')
+        if len(name) > Recipe._meta.get_field('name').max_length:
+            raise ValueError('name is too long')
+        if not isinstance(record.get('author'), str):
+            raise ValueError('author must be an e-mail string')
+        if not isinstance(record.get('text', ''), str):
+            raise ValueError('text must be a string')
+        image = record.get('image', '')
+        if not isinstance(image, str) or (
+            len(image) > Recipe._meta.get_field('image').max_length
+        ):
+            raise ValueError('image must be a path string')
+        if not is_small_integer(record.get('cooking_time', 1)):
+            raise ValueError(
+                f"invalid cooking_time {record.get('cooking_time')}"
+            )
+
+        tags = record.get('tags', [])
+        if not isinstance(tags, list) or not all(
+            isinstance(slug, str) for slug in tags
+        ):
+            raise ValueError('tags must be a list of slugs')
+
+        ingredients = record.get('ingredients', [])
+        if not isinstance(ingredients, list):
+            raise ValueError('ingredients must be a list')
+        for ingredient in ingredients:
+            if not isinstance(ingredient, dict):
+                raise ValueError(f'invalid ingredient {ingredient}')
+            if 'id' in ingredient:
+                if not is_integer(ingredient['id']):
+                    raise ValueError('ingredient id must be an integer')
+            elif not all(
+                isinstance(ingredient.get(field), str)
+                for field in ('name', 'measurement_unit')
+            ):
+                raise ValueError(
+                    'ingredient requires an id or name and measurement_unit'
+                )
+            if not is_small_integer(ingredient.get('amount')):
+                raise ValueError(
+                    f"invalid amount {ingredient.get('amount')}"
+                )
+
+    def report_error(self, line_number, error):
+        if self.verbosity > 1:
+            self.stderr.write(f'line {line_number}: {error}')
+
+    def resolve_authors(self, batch):
+        emails = {
+            record.get('author') for _, record in batch
+        } - self.authors.keys()
+        self.authors.update(
+            User.objects.filter(email__in=emails).values_list('email', 'id')
+        )
+
+    def resolve_ingredient(self, ingredient):
+        if 'id' in ingredient:
+            if ingredient['id'] not in self.ingredient_ids:
+                raise RecordError(f"unknown ingredient id {ingredient['id']}")
+            return ingredient['id']
+        key = (ingredient.get('name'), ingredient.get('measurement_unit'))
+        if key not in self.ingredients:
+            raise RecordError(f'unknown ingredient {key[0]} ({key[1]})')
+        return self.ingredients[key]
+
+    def build_recipe(self, record):
+        """
+        Проверяет ссылки записи (проверенной validate_record) на автора,
+        теги и ингредиенты и возвращает рецепт, id тегов и словарь
+        {id ингредиента: количество}.
+        """
+
+        try:
+            author_id = self.authors[record.get('author')]
+        except KeyError:
+            raise RecordError(f"unknown author {record.get('author')}")
+        try:
+            tag_ids = {self.tags[slug] for slug in record.get('tags', [])}
+        except KeyError as error:
+            raise RecordError(f'unknown tag {error}')
+
+        ingredients = {
+            self.resolve_ingredient(ingredient): ingredient['amount']
+            for ingredient in record.get('ingredients', [])
+        }
+
+        if not record.get('name') or not tag_ids or not ingredients:
+            raise RecordError('name, tags and ingredients are required')
+
+        recipe = Recipe(
+            name=record['name'],
+            text=record.get('text', ''),
+            cooking_time=record.get('cooking_time', 1),
+            author_id=author_id,
+            image=record.get('image', ''),
+            tag_ids=sorted(tag_ids),
+            ingredients_count=len(ingredients),
+        )
+
+        return recipe, tag_ids, ingredients
+
+    def import_batch(self, batch):
+        self.resolve_authors(batch)
+        existing_names = set(
+            Recipe.objects.filter(
+                name__in=[record.get('name') for _, record in batch]
+            ).values_list('name', flat=True)
+        )
+
+        recipes = {}
+        for line_number, record in batch:
+            try:
+                if record.get('name') in existing_names:
+                    raise RecordError(f"recipe {record['name']} exists")
+                recipe = self.build_recipe(record)
+            except RecordError as error:
+                self.report_error(line_number, error)
+                self.stats['skipped'] += 1
+                continue
+            existing_names.add(recipe[0].name)
+            recipes[recipe[0].name] = recipe
+
+        with transaction.atomic():
+            Recipe.objects.bulk_create(
+                [recipe for recipe, _, _ in recipes.values()],
+                batch_size=BULK_BATCH_SIZE
+            )
+            if not connection.features.can_return_rows_from_bulk_insert:
+                ids = dict(
+                    Recipe.objects.filter(name__in=recipes).
+                    values_list('name', 'id')
+                )
+                for recipe, _, _ in recipes.values():
+                    recipe.id = ids[recipe.name]
+
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                for recipe, tag_ids, _ in recipes.values()
+                for tag_id in tag_ids
+            ], batch_size=BULK_BATCH_SIZE)
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient_id,
+                    quantity=amount
+                )
+                for recipe, _, ingredients in recipes.values()
+                for ingredient_id, amount in ingredients.items()
+            ], batch_size=BULK_BATCH_SIZE)
+            # Рецепты добавляются без сигналов, поэтому счетчики рецептов
+            # авторов пересчитываются явно.
+            services.repair_counters(User, {
+                recipe.author_id for recipe, _, _ in recipes.values()
+            })
+
+        self.stats['imported'] += len(recipes)
+        elapsed = time.monotonic() - self.started
+        processed = sum(self.stats.values())
+        self.stdout.write(
+            f"{processed} records processed, {self.stats['imported']} "
+            f'imported, {processed / elapsed:.0f} records/s'
+        )
@@ -1,14 +1,24 @@
 """
-Команда для загрузки данных из csv файла. Путь к файлу задается как аргумент
-команды.
+Команда для загрузки ингредиентов из csv или json файла. Путь к файлу
+задается как аргумент команды.
+Формат csv: название ингредиента,единица измерения (без заголовка).
+Формат json: список объектов с ключами name и measurement_unit.
+Ингредиенты, уже имеющиеся в базе данных, пропускаются, поэтому команду
+можно повторно запускать на рабочей базе данных.
 """
 
 import csv
+import json
+import os
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from api import versions
 
 from ...models import Ingredient
 
+MAX_LENGTH = Ingredient._meta.get_field('name').max_length
+
 
 class Command(BaseCommand):
 
@@ -20,18 +30,99 @@ class Command(BaseCommand):
             'file_path',
             type=str,
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Число записей, загружаемых за один запрос',
+        )
 
     def handle(self, *args, **options):
 
-        number_of_records_in_base = Ingredient.objects.count()
-        reader = csv.DictReader(
-                open(options['file_path']),
-                fieldnames=['name', 'measurement_unit']
+        self.stats = {'inserted': 0, 'skipped': 0, 'malformed': 0}
+
+        try:
+            with open(options['file_path'], encoding='utf-8') as file:
+                if os.path.splitext(file.name)[1].lower() == '.json':
+                    rows = self.read_json(file)
+                else:
+                    rows = self.read_csv(file)
+                self.load(rows, options['batch_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        # bulk_create не отправляет сигналы post_save, поэтому версия
+        # справочника ингредиентов обновляется явно.
+        if self.stats['inserted']:
+            versions.bump(('ingredient',))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Successfully loaded: {inserted} inserted, {skipped} skipped, '
+            '{malformed} malformed'.format(**self.stats)
+        ))
+
+    def read_csv(self, file):
+        for row in csv.reader(file):
+            yield row
+
+    def read_json(self, file):
+        # Стандартный модуль json не умеет разбирать документ по частям,
+        # поэтому список загружается целиком, а записи выдаются по одной.
+        for item in json.load(file):
+            if isinstance(item, dict):
+                yield [item.get('name'), item.get('measurement_unit')]
+            else:
+                yield item
+
+    def clean(self, row):
+        """
+        Возвращает пару (название, единица измерения) или None для
+        некорректной записи.
+        """
+
+        if not isinstance(row, list) or len(row) != 2:
+            return None
+        name, measurement_unit = row
+        if not isinstance(name, str) or not isinstance(measurement_unit, str):
+            return None
+        name, measurement_unit = name.strip(), measurement_unit.strip()
+        if not (0 < len(name) <= MAX_LENGTH
+                and 0 < len(measurement_unit) <= MAX_LENGTH):
+            return None
+
+        return name, measurement_unit
+
+    def load(self, rows, batch_size):
+        batch = set()
+        for row in rows:
+            pair = self.clean(row)
+            if pair is None:
+                self.stats['malformed'] += 1
+            elif pair in batch:
+                self.stats['skipped'] += 1
+            else:
+                batch.add(pair)
+            if len(batch) >= batch_size:
+                self.load_batch(batch)
+                batch = set()
+        if batch:
+            self.load_batch(batch)
+
+    def load_batch(self, batch):
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in batch}
+            ).values_list('name', 'measurement_unit')
         )
+        new = batch - existing
 
-        Ingredient.objects.bulk_create([Ingredient(**data) for data in reader])
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in new
+            ],
+            ignore_conflicts=True
+        )
 
-        if (Ingredient.objects.count() > number_of_records_in_base):
-            self.stdout.write(self.style.SUCCESS('Successfully loaded'))
-        else:
-            self.stdout.write(self.style.ERROR('NOT loaded'))
+        self.stats['inserted'] += len(new)
+        self.stats['skipped'] += len(existing & batch)
@@ -0,0 +1,70 @@
+"""
+Команда для проверки и пересчета счетчиков рецептов (избранное, списки
+покупок, ингредиенты) и пользователей (рецепты, подписчики) по связанным
+записям. С ключом --check только проверяет счетчики и завершается с
+ошибкой, если найдены расхождения.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import find_counters_drift, repair_counters
+
+from ...models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+
+    help = 'Проверка и пересчет счетчиков рецептов и пользователей'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счетчики на расхождения',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Число объектов, обрабатываемых за один проход',
+        )
+
+    def handle(self, *args, **options):
+
+        process = (
+            find_counters_drift if options['check'] else repair_counters
+        )
+        batch_size = options['batch_size']
+
+        drifted = 0
+        for model in (Recipe, User):
+            ids = list(
+                model.objects.order_by('id').values_list('id', flat=True)
+            )
+            drift = {}
+            for start in range(0, len(ids), batch_size):
+                drift.update(process(model, ids[start:start + batch_size]))
+            drifted += len(drift)
+
+            name = model._meta.model_name
+            for field in sorted({field for _, field in drift}):
+                count = sum(1 for key in drift if key[1] == field)
+                self.stdout.write(f'{name}.{field}: {count} drifted')
+            if options['verbosity'] > 1:
+                for (id, field), (stored, expected) in sorted(drift.items()):
+                    self.stdout.write(
+                        f'{name} {id} {field}: {stored} -> {expected}'
+                    )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('No drift found in counters'))
+        elif options['check']:
+            raise CommandError(f'Drift found: {drifted} counters')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired {drifted} counters'
+            ))
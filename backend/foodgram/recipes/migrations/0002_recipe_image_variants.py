@@ -0,0 +1,23 @@
+# Generated by Django 3.2.11 on 2026-10-18 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_card',
+            field=models.ImageField(blank=True, upload_to='images/card/', verbose_name='Изображение для карточки рецепта'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, upload_to='images/thumbnail/', verbose_name='Миниатюра изображения для рецепта'),
+        ),
+    ]
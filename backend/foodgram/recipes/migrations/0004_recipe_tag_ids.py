@@ -0,0 +1,38 @@
+# Generated by Django 3.2.11 on 2026-10-18 01:21
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+from django.db.models import Func, OuterRef, Subquery
+
+
+def fill_tag_ids(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeTag = Recipe._meta.get_field('tags').remote_field.through
+    Recipe.objects.update(tag_ids=Func(
+        Subquery(
+            RecipeTag.objects.filter(recipe_id=OuterRef('pk')).
+            values('tag_id')
+        ),
+        template='ARRAY%(expressions)s'
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, editable=False, size=None, verbose_name='id тегов рецепта'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='recipe_tag_ids_gin_idx'),
+        ),
+        migrations.RunPython(fill_tag_ids, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core import validators
 from django.db import models
 
@@ -119,6 +121,16 @@ class Recipe(models.Model):
         'Изображение для рецепта',
         upload_to='images/',
     )
+    image_card = models.ImageField(
+        'Изображение для карточки рецепта',
+        upload_to='images/card/',
+        blank=True,
+    )
+    image_thumbnail = models.ImageField(
+        'Миниатюра изображения для рецепта',
+        upload_to='images/thumbnail/',
+        blank=True,
+    )
     tags = models.ManyToManyField(
         Tag,
         verbose_name='Теги рецепта',
@@ -130,28 +142,76 @@ class Recipe(models.Model):
         verbose_name='Ингредиент с указанием количества для рецепта',
         related_name='recipes',
     )
+    # Копия id тегов рецепта из таблицы связей для фильтрации по тегам
+    # без JOIN и DISTINCT. Обновляется при изменении тегов рецепта
+    # (api.services.update_recipe_tag_ids).
+    tag_ids = ArrayField(
+        models.IntegerField(),
+        verbose_name='id тегов рецепта',
+        default=list,
+        blank=True,
+        editable=False,
+    )
+    # Счетчики связанных записей. Изменяются запросами UPDATE с F() при
+    # изменении связей (api.services.change_counter) и пересчитываются
+    # командой repair_counters.
+    favorites_count = models.PositiveIntegerField(
+        'Число добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    shopping_count = models.PositiveIntegerField(
+        'Число добавлений в списки покупок',
+        default=0,
+        editable=False,
+    )
+    ingredients_count = models.PositiveIntegerField(
+        'Число ингредиентов',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            # Лента рецептов и пагинация по ключу (-pub_date, -id).
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            # Рецепты автора в порядке публикации (фильтр по автору и
+            # рецепты в списке подписок).
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            # Фильтр по тегам: tag_ids && ARRAY[...].
+            GinIndex(fields=['tag_ids'], name='recipe_tag_ids_gin_idx'),
+            # Сортировка ordering=popular (-favorites_count, -id).
+            models.Index(
+                fields=['favorites_count', 'id'],
+                name='recipe_favorites_count_id_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.name}, автор {self.author}'
 
     def _get_number_additions_to_favourite(self):
         """
-        Функция вычисляет число добавления рецептов в избранное.
+        Функция возвращает число добавлений рецепта в избранное.
         """
-        return self.favorites.count()
+        return self.favorites_count
 
     _get_number_additions_to_favourite.short_description = 'в избранном у'
 
     def _get_number_ingredients(self):
         """
-        Функция вычисляет число ингредиентов в рецепте.
+        Функция возвращает число ингредиентов в рецепте.
         """
-        return self.ingredients.count()
+        return self.ingredients_count
 
     _get_number_ingredients.short_description = 'количество ингредиентов'
 
@@ -187,7 +247,7 @@ class IngredientInRecipe(models.Model):
     class Meta:
         verbose_name = 'Ингредиент-количество для рецепта'
         verbose_name_plural = 'Ингредиенты с количествами для рецепта'
-        ordering = ('recipe__name',)
+        ordering = ('recipe_id', 'id')
         constraints = [
             models.UniqueConstraint(
                 fields=['ingredient', 'recipe'],
@@ -0,0 +1,131 @@
+import io
+import json
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from users.models import User
+
+from .models import Ingredient, Recipe, Tag
+
+
+class ImportRecipesTest(TestCase):
+    """
+    Загрузка рецептов командой import_recipes: некорректные записи
+    пропускаются и учитываются как malformed, не прерывая загрузку пакета.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(
+            username='chef', email='chef@example.com', password='password'
+        )
+        Tag.objects.create(name='Завтрак', color='#e26c2d', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='яйца', measurement_unit='шт'
+        )
+
+    def get_record(self, **fields):
+        record = {
+            'name': 'Омлет',
+            'text': 'Взбить и пожарить.',
+            'cooking_time': 10,
+            'author': 'chef@example.com',
+            'tags': ['breakfast'],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 3}],
+        }
+        record.update(fields)
+        return record
+
+    def import_records(self, records):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as file:
+            for record in records:
+                file.write(json.dumps(record) + '\n')
+            file.flush()
+            output = io.StringIO()
+            call_command('import_recipes', file.name, stdout=output)
+        return output.getvalue()
+
+    def test_malformed_records(self):
+        malformed = [
+            self.get_record(cooking_time=0),
+            self.get_record(cooking_time=-5),
+            self.get_record(cooking_time='10'),
+            self.get_record(cooking_time=None),
+            self.get_record(cooking_time=True),
+            self.get_record(name='а' * 201),
+            self.get_record(name=''),
+            self.get_record(name=['Омлет']),
+            self.get_record(tags='breakfast'),
+            self.get_record(ingredients={'id': self.ingredient.id}),
+            self.get_record(author={'email': 'chef@example.com'}),
+            self.get_record(author=['chef@example.com']),
+            self.get_record(ingredients=[{'id': [1], 'amount': 3}]),
+            self.get_record(
+                ingredients=[{'id': self.ingredient.id, 'amount': 10 ** 6}]
+            ),
+            ['not', 'an', 'object'],
+        ]
+        valid = self.get_record(
+            name='Яичница',
+            ingredients=[
+                {'name': 'яйца', 'measurement_unit': 'шт', 'amount': 2}
+            ],
+        )
+
+        output = self.import_records([*malformed, valid])
+
+        self.assertIn(
+            f'1 imported, 0 skipped, {len(malformed)} malformed', output
+        )
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.name, 'Яичница')
+        self.assertEqual(recipe.tag_ids, list(Tag.objects.values_list(
+            'id', flat=True
+        )))
+
+    def test_unknown_references_skipped(self):
+        output = self.import_records([
+            self.get_record(author='nobody@example.com'),
+            self.get_record(tags=['dinner']),
+            self.get_record(ingredients=[{'id': 0, 'amount': 1}]),
+            self.get_record(),
+            self.get_record(),
+        ])
+
+        self.assertIn('1 imported, 4 skipped, 0 malformed', output)
+        self.assertEqual(Recipe.objects.get().ingredients_count, 1)
+
+
+class RepairCountersTest(TestCase):
+    """
+    Проверка и пересчет счетчиков командой repair_counters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='chef', email='chef@example.com', password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Омлет', text='Описание', cooking_time=10,
+            image='images/recipe.png'
+        )
+        cls.user.favorite_recipes.add(cls.recipe)
+
+    def test_check_fails_on_drift(self):
+        call_command('repair_counters', check=True, stdout=io.StringIO())
+
+        Recipe.objects.update(favorites_count=5)
+        User.objects.update(recipes_count=0)
+        with self.assertRaisesMessage(CommandError, 'Drift found: 2'):
+            call_command('repair_counters', check=True, stdout=io.StringIO())
+
+        call_command('repair_counters', stdout=io.StringIO())
+        call_command('repair_counters', check=True, stdout=io.StringIO())
+        self.recipe.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.user.recipes_count, 1)
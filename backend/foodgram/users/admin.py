@@ -3,6 +3,9 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserCreationForm
 from rest_framework.authtoken.admin import TokenAdmin
 
+from api import services
+from recipes.models import Recipe
+
 from .models import Subscribe, User
 
 
@@ -67,8 +70,34 @@ class CustomUserAdmin(UserAdmin):
     list_display = (
         'username',
         'email',
+        'recipes_count',
+        'followers_count',
     )
 
+    def get_list_recipe_ids(self, user):
+        return {
+            *user.favorite_recipes.values_list('id', flat=True),
+            *user.shopping_recipes.values_list('id', flat=True),
+        }
+
+    def save_related(self, request, form, formsets, change):
+        """
+        Избранное и список покупок изменяются в форме через промежуточные
+        модели без сигнала m2m_changed, поэтому счетчики рецептов, которые
+        были или стали в списках пользователя, пересчитываются. Счетчики
+        самого пользователя пересчитываются, так как форма сохраняет все
+        поля пользователя.
+        """
+
+        recipe_ids = (
+            self.get_list_recipe_ids(form.instance) if change else set()
+        )
+        super().save_related(request, form, formsets, change)
+        services.repair_counters(
+            Recipe, recipe_ids | self.get_list_recipe_ids(form.instance)
+        )
+        services.repair_counters(User, [form.instance.id])
+
 
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,67 @@
+"""
+Команда для проверки и пересборки сводных списков покупок пользователей.
+С ключом --check только проверяет списки и завершается с ошибкой, если
+найдены расхождения.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from api.services import find_shopping_lists_drift, rebuild_shopping_lists
+
+from ...models import User
+
+
+class Command(BaseCommand):
+
+    help = 'Проверка и пересборка сводных списков покупок'
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить списки покупок на расхождения',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Число пользователей, обрабатываемых за один проход',
+        )
+
+    def handle(self, *args, **options):
+
+        process = (
+            find_shopping_lists_drift if options['check']
+            else rebuild_shopping_lists
+        )
+        user_ids = list(
+            User.objects.filter(
+                Q(shopping_recipes__isnull=False)
+                | Q(shopping_list__isnull=False)
+            ).distinct().order_by('id').values_list('id', flat=True)
+        )
+
+        drifted_users = set()
+        drifted_rows = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(user_ids), batch_size):
+            drift = process(user_ids[start:start + batch_size])
+            drifted_rows += len(drift)
+            drifted_users.update(user_id for user_id, _ in drift)
+
+        if not drifted_rows:
+            self.stdout.write(self.style.SUCCESS(
+                f'No drift found in {len(user_ids)} shopping lists'
+            ))
+        elif options['check']:
+            raise CommandError(
+                f'Drift found: {drifted_rows} rows in '
+                f'{len(drifted_users)} shopping lists'
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {len(drifted_users)} shopping lists '
+                f'({drifted_rows} rows fixed)'
+            ))
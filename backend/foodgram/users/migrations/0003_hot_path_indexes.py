@@ -0,0 +1,30 @@
+# Generated by Django 3.2.11 on 2026-10-18 01:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_shoppinglistingredient'),
+    ]
+
+    operations = [
+        # Автоматически созданные таблицы связей избранного и списка
+        # покупок имеют уникальный индекс (user_id, recipe_id); индекс
+        # (recipe_id, user_id) нужен для выборок по рецепту.
+        migrations.RunSQL(
+            'CREATE INDEX users_user_favorite_recipe_user_idx '
+            'ON users_user_favorite_recipes (recipe_id, user_id);',
+            'DROP INDEX users_user_favorite_recipe_user_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX users_user_shopping_recipe_user_idx '
+            'ON users_user_shopping_recipes (recipe_id, user_id);',
+            'DROP INDEX users_user_shopping_recipe_user_idx;',
+        ),
+        migrations.AddIndex(
+            model_name='subscribe',
+            index=models.Index(fields=['user_author', 'user'], name='subscribe_author_user_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.11 on 2026-10-18 01:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_rows(model, column):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{column: OuterRef('pk')}).order_by().
+            values(column).annotate(count=Count('*')).values('count')
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscribe = apps.get_model('users', 'Subscribe')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User.objects.update(
+        recipes_count=count_rows(Recipe, 'author_id'),
+        followers_count=count_rows(Subscribe, 'user_author_id'),
+    )
+    Recipe.objects.update(
+        favorites_count=count_rows(
+            User._meta.get_field('favorite_recipes').remote_field.through,
+            'recipe_id'
+        ),
+        shopping_count=count_rows(
+            User._meta.get_field('shopping_recipes').remote_field.through,
+            'recipe_id'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_counters'),
+        ('users', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
-from recipes.models import Recipe
+from recipes.models import Ingredient, Recipe
 
 
 class User(AbstractUser):
@@ -53,6 +53,17 @@ class User(AbstractUser):
         verbose_name='Рецепты в списке покупок',
         related_name='shoppings',
     )
+    # Счетчики рецептов и подписчиков автора, см. Recipe.favorites_count.
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
 
@@ -100,6 +111,13 @@ class Subscribe(models.Model):
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ('user',)
+        indexes = [
+            # Подписчики автора: проверка подписки на автора рецепта.
+            models.Index(
+                fields=['user_author', 'user'],
+                name='subscribe_author_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'user_author'],
@@ -113,3 +131,42 @@ class Subscribe(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.user_author}'
+
+
+class ShoppingListIngredient(models.Model):
+    """
+    Модель для описания сводного списка покупок пользователя: суммарное
+    количество каждого ингредиента по всем рецептам из списка покупок.
+    Поддерживается в актуальном состоянии при изменении списка покупок и
+    ингредиентов рецептов.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_lists',
+    )
+    amount = models.IntegerField(
+        'Суммарное количество ингредиента',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        ordering = ('user_id', 'ingredient_id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='уникальность ингредиента в списке покупок',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.amount} {self.ingredient}'
@@ -0,0 +1,55 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+from .models import ShoppingListIngredient, User
+
+
+class RebuildShoppingListsTest(TestCase):
+    """
+    Проверка и пересборка сводных списков покупок командой
+    rebuild_shopping_lists.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        ingredient = Ingredient.objects.create(
+            name='яйца', measurement_unit='шт'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Омлет', text='Описание', cooking_time=10,
+            image='images/recipe.png'
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, quantity=3
+        )
+        # Рецепт добавляется в список покупок без сигналов, поэтому
+        # сводный список покупок расходится с рецептами.
+        User.shopping_recipes.through.objects.bulk_create([
+            User.shopping_recipes.through(user=cls.user, recipe=recipe)
+        ])
+
+    def test_check_fails_on_drift(self):
+        with self.assertRaisesMessage(CommandError, 'Drift found'):
+            call_command(
+                'rebuild_shopping_lists', check=True, stdout=io.StringIO()
+            )
+        self.assertFalse(ShoppingListIngredient.objects.exists())
+
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        call_command(
+            'rebuild_shopping_lists', check=True, stdout=io.StringIO()
+        )
+        self.assertEqual(
+            list(ShoppingListIngredient.objects.values_list(
+                'user_id', 'amount'
+            )),
+            [(self.user.id, 3)]
+        )